@@ -93,7 +93,7 @@ def run_multi_simulations(tasks, max_workers=None):
             'path_dict': path_dict,
             'ntasks': task.get('ntasks', 4),
             'use_gpu': task.get('use_gpu', True),
-            'gpu_options': task.get('gpu_options', "1"),
+            'ngpus': task.get('ngpus', 1),
             'binsize': task.get('binsize', None)
         }
         
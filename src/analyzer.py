@@ -202,18 +202,13 @@ def analyze_plane(plane_data):
     Returns:
         tuple: (zero_in_vol, var3) 空隙率和方差
     """
-    index_list = np.nonzero(plane_data)
-    none_zero = index_list[0].size
     length = plane_data.shape[0]
-    zero = length * length - none_zero
+    # 非零格点的值，按列优先顺序与逐点遍历一致
+    one_line = plane_data.T[plane_data.T != 0]
+    zero = length * length - one_line.size
     zero_in_vol = zero / (length * length)
     
-    one_line = []
-    for deny in range(length):
-        for denx in range(length):
-            if plane_data[denx][deny] != 0:
-                one_line.append(plane_data[denx][deny])
-    var3 = np.var(np.asarray(one_line))
+    var3 = np.var(one_line)
     return (zero_in_vol, var3)
 
 
@@ -228,13 +223,8 @@ def calculate_pore_size(data):
     """
     pore_size_obj = PoreSizeAnalyzer(data)
     (size_list, xy_list) = pore_size_obj.walk()
-    myset = set(size_list)
-    size_all = 0
-    count = 0
-    for item in myset:
-        size_all += item * size_list.count(item)
-        count += size_list.count(item)
-    average = size_all / count if count > 0 else 0
+    # 按孔径加权求和再除以孔数，即所有孔径的平均值
+    average = sum(size_list) / len(size_list) if size_list else 0
     return average
 
 
@@ -7,12 +7,27 @@ from src.readdata import get_map_type_str
 import logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+def section_names(path_dict, section):
+    """按 path_dict['_sections'] 记录的区间取出某类分子的文件名列表。
+    
+    Args:
+        path_dict: 包含 file_name 列表的字典
+        section: 区间名，reactants、products_1st、byproduct 或 products_2nd
+        
+    Returns:
+        list: 该区间内的分子文件名列表
+    """
+    # 未经过产物初始化的 path_dict 只包含 r1, r2, sol
+    start, stop = path_dict.get('_sections', {}).get(section, (0, 3) if section == 'reactants' else (0, 0))
+    return path_dict['file_name'][start:stop]
+
 def construct_system(path_dict, box_len = 60):
     """构建分子系统。
 
     Args:
         path_dict: 包含反应物、溶剂及产物的文件名、SMILES 和路径信息的字典。
             - file_name: 按顺序存储的分子文件名列表 [r1, r2, sol, p1, p2, ..., byp, p1, p2, ...]
+            - _sections: 各类分子在 file_name 中的区间 [start, stop)，见 section_names
             - type: 各种分子的类型字典
             - num: 各种分子的数量字典
             - paths: 各种路径信息
@@ -26,7 +41,7 @@ def construct_system(path_dict, box_len = 60):
     
     # 获取反应物和溶剂的文件名和数量
     # 按照file_name列表的顺序，前三个元素分别是r1, r2, sol
-    name_list = path_dict['file_name'][:3]  # 获取r1, r2, sol
+    name_list = section_names(path_dict, 'reactants')  # 获取r1, r2, sol
     num_list = [path_dict['num'][name] for name in name_list]
     
     # 执行各个步骤
@@ -43,9 +58,9 @@ def prepare_reaction_templates(path_dict):
     Args:
         path_dict: 包含反应物、溶剂及产物的文件名、SMILES 和路径信息的字典。
             - file_name: 按顺序存储的分子文件名列表 [r1, r2, sol, p1, p2, ..., byp, p1, p2, ...]
+            - _sections: 各类分子在 file_name 中的区间 [start, stop)，见 section_names
             - type: 各种分子的类型字典
             - paths: 各种路径信息
-            - p_smiles_num: 产物分子的数量
             
     Returns:
         无返回值，但会在path_dict中添加以下键：
@@ -54,12 +69,9 @@ def prepare_reaction_templates(path_dict):
         - map_templates: 反应映射模板字典
     """
     # 获取 pre_list 和 post_list 分子名列表    
-    p_count = path_dict['p_smiles_num']
-    # 产物在file_name中的位置是从索引3开始，到3+p_count结束
-    p_names = path_dict['file_name'][3:3+p_count]
+    p_names = section_names(path_dict, 'products_1st')
 
-    # 根据file_name列表的顺序，产物后一个元素是byp
-    byp_name = path_dict['file_name'][3+p_count]
+    byp_name = section_names(path_dict, 'byproduct')[0]
 
     # 根据产物和二次产物进行循环
     # 输出首次反应的反应物和产物信息
@@ -78,23 +90,20 @@ def prepare_reaction_templates(path_dict):
         post_lists.append([p_name, byp_name])
     
     # 二次反应产物
-    if 'p_smiles_num_2nd' in path_dict:
-        p_count_2nd = path_dict['p_smiles_num_2nd']
-        second_reaction_p_names = path_dict['file_name'][4+p_count:4+p_count+p_count_2nd]
+    if 'products_2nd' in path_dict.get('_sections', {}):
+        second_reaction_p_names = section_names(path_dict, 'products_2nd')
         
         # 输出二次反应的反应物和产物信息
         logging.info("二次反应信息:")
         for p_name in second_reaction_p_names:
-            # 例如r1_1_r2_1_r2_1_2nd_1
-            # 前r1_1是r1, r2_1是r2, r1_1_r2_1是一次次产物作为反应物1, r2_1是二次产物作为反应物2
+            # 例如r1_1_r2_1_2_r2_1_2nd_1，命名为 上一级产物_r2_2nd_index
+            # r1_1_r2_1_2是上一级产物作为反应物1, r2_1是反应物2
             name_list = p_name.split('_')
             # 解析命名获取各反应物和产物
-            # r1_1
-            r1_name = name_list[0] + '_' + name_list[1]
             # r2_1
             r2_name = name_list[2] + '_' + name_list[3]
-            # r1_1_r2_1
-            first_product = r1_name + '_' + r2_name + '_' + name_list[4]
+            # 去掉末尾的 _r2_1_2nd_1 即为上一级产物，多级反应时同样适用
+            first_product = p_name.rsplit('_', 4)[0]
             logging.info(f"Map：二级反应物 [{first_product}, {r2_name}], 产物 [{p_name}, {byp_name}]")
             pre_lists.append([first_product, r2_name])
             post_lists.append([p_name, byp_name])
@@ -116,9 +125,9 @@ def construct_reaction_map(path_dict):
     Args:
         path_dict: 包含反应物、溶剂及产物的文件名、SMILES 和路径信息的字典。
             - file_name: 按顺序存储的分子文件名列表 [r1, r2, sol, p1, p2, ..., byp, p1, p2, ...]
+            - _sections: 各类分子在 file_name 中的区间 [start, stop)，见 section_names
             - type: 各种分子的类型字典
             - paths: 各种路径信息
-            - p_smiles_num: 产物分子的数量
 
     """
     # 从 path_dict 中读取所需信息
@@ -138,7 +147,8 @@ def construct_reaction_map(path_dict):
         post_list = map_templates[map_name][2:]
         post_map_name = f"post_{map_name}"
         write_react_lt(lt_PATH, post_map_name, post_list)
-        exec_moltemplate_reaction(lt_PATH, data_PATH, map_name)
+    # 各反应模板的 moltemplate 并行运行
+    exec_moltemplate_reaction_list(lt_PATH, data_PATH, map_templates.keys())
     
     # 清理整理力场信息
     exec_AutoMapper_clean(data_PATH, map_PATH, map_templates.keys())
@@ -0,0 +1,33 @@
+# codec.py
+# 反应索引数据的编码与解码，只依赖标准库与 msgpack，读取数据库数据时无需导入 RDKit 等
+
+import ast
+import sqlite3
+import msgpack
+
+def encode_reaction_index_dicts(atom_indices_dict_list):
+    """
+    将反应索引字典列表使用 msgpack 编码为 BLOB 存入数据库。
+
+    Args:
+        atom_indices_dict_list (list of dict): 反应索引字典列表。
+
+    Returns:
+        sqlite3.Binary: 编码后的二进制数据。
+    """
+    return sqlite3.Binary(msgpack.packb(atom_indices_dict_list))
+
+def decode_reaction_index_dicts(encoded):
+    """
+    将数据库中读取的反应索引数据解码为字典列表，兼容 BLOB 与旧版字符串格式。
+
+    Args:
+        encoded (bytes or str): encode_reaction_index_dicts 编码的数据，或旧版 encode_nested_structure_v2 字符串。
+
+    Returns:
+        list of dict: 反应索引字典列表。
+    """
+    if isinstance(encoded, bytes):
+        # 原子索引以整数为键，需关闭 strict_map_key
+        return msgpack.unpackb(encoded, raw=False, strict_map_key=False)
+    return ast.literal_eval(encoded)
@@ -6,11 +6,20 @@ import sqlite3
 import csv
 import os
 import math
+import itertools
+import base64
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from rdkit import Chem
 from src.generator import generate_reaction_smile
 from src.molecular import MolecularModule
+from src.codec import encode_reaction_index_dicts, decode_reaction_index_dicts
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# 反应条件的自然键：反应物、溶剂与比例唯一确定一行数据
+NATKEY_COLUMNS = ('reactant1_key', 'reactant2_key', 'solvent_key',
+                  'reactant1_ratio', 'reactant2_ratio', 'solvent_ratio')
 
 # 数据库模块类
 class DatabaseModule:
@@ -26,6 +35,9 @@ class DatabaseModule:
         self.rat_list = []
         self.connection = sqlite3.connect(db_path)
         self.cursor = self.connection.cursor()
+        # 按列名缓存 UPDATE 语句，使 sqlite 预编译语句缓存得以复用
+        self._update_stmts = {}
+        self._columns = None
 
     def data_init(self, base_num : int = 250, properties_list : list = [
         'group_smiles', 'rings', 'count_group', 
@@ -70,7 +82,7 @@ class DatabaseModule:
         """
         self.cursor.execute('''
             CREATE TABLE IF NOT EXISTS reactions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                id INTEGER PRIMARY KEY,
                 reactant1_smiles TEXT,
                 reactant2_smiles TEXT,
                 solvent_smiles TEXT,
@@ -87,19 +99,39 @@ class DatabaseModule:
         all_list = self.get_reactant_list(smile_path)
         # 添加反应物基础 SMILE 信息
         self.fill_data(*all_list)
+        # 批量插入完成后再建立索引，加快初次写入；唯一索引保证重复初始化时 INSERT OR IGNORE 不产生重复行
+        self.create_index()
+
+    def create_index(self):
+        """为反应物 SMILES 建立查询索引，并为反应条件自然键建立唯一索引"""
+        self.cursor.execute(
+            'CREATE INDEX IF NOT EXISTS reactions_rs ON reactions(reactant1_smiles, reactant2_smiles)'
+        )
+        self.cursor.execute(
+            f'CREATE UNIQUE INDEX IF NOT EXISTS reactions_natkey ON reactions({", ".join(NATKEY_COLUMNS)})'
+        )
+        self.connection.commit()
 
     def get_smiles_file(self, file_path):
-        """读取SMILES文件并返回每行的列表
+        """读取SMILES文件并返回每行标准化后的列表，等价的 SMILES 只保留首次出现的一个
         Args:
             file_path: SMILES文件的路径
         Returns:
-            返回包含SMILES字符串的列表
+            返回包含标准 SMILES 字符串的列表，无法解析的行将被丢弃
         """
         with open(file_path, 'r', encoding='utf-8') as file:
             lines = file.readlines()
         # 去掉每行末尾的换行符，并忽略空行
         lines = [line.strip() for line in lines if line.strip()]
-        return lines
+        # 标准化 SMILES 并按首次出现的顺序去重，保持分子键值与文件行序一致
+        canonical_smiles = {}
+        for line in lines:
+            mol = Chem.MolFromSmiles(line)
+            if mol is None:
+                logging.warning(f"{file_path} 中的 SMILES {line} 无法解析，已忽略")
+                continue
+            canonical_smiles.setdefault(Chem.MolToSmiles(mol, canonical=True), None)
+        return list(canonical_smiles)
 
     def get_ratios(self):
         """获得反应物、溶剂的比例，两种反应物比例不为0。
@@ -142,9 +174,9 @@ class DatabaseModule:
                     for ratio in ratios:
                         r1_ratio, r2_ratio, solvent_ratio = ratio
 
-                        # 插入数据与分子键值
+                        # 插入数据与分子键值，自然键已存在时由唯一索引忽略
                         self.cursor.execute('''
-                            INSERT INTO reactions (reactant1_smiles, reactant2_smiles, solvent_smiles, 
+                            INSERT OR IGNORE INTO reactions (reactant1_smiles, reactant2_smiles, solvent_smiles, 
                                                 reactant1_ratio, reactant2_ratio, solvent_ratio,
                                                 reactant1_key, reactant2_key, solvent_key)
                             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
@@ -161,14 +193,44 @@ class DatabaseModule:
         result = self.cursor.fetchall()
         return result
 
-    def add_column(self, column_name, column_type):
+    def add_column(self, column_name, column_type, default=None):
         """在表中添加新列
         Args:
             column_name: 新列的名称
             column_type: 新列的数据类型（如REAL, TEXT等）
+            default: 新列的默认值，给定时新列为 NOT NULL
         """
-        self.cursor.execute(f'ALTER TABLE reactions ADD COLUMN {column_name} {column_type}')
+        constraint = f' NOT NULL DEFAULT {_sql_literal(default)}' if default is not None else ''
+        self.cursor.execute(f'ALTER TABLE reactions ADD COLUMN {column_name} {column_type}{constraint}')
         self.connection.commit()
+        self._columns = None
+
+    def get_columns(self):
+        """获取数据表的列名集合，结果缓存到添加新列为止
+        Returns:
+            包含所有列名的集合
+        """
+        if self._columns is None:
+            self.cursor.execute("PRAGMA table_info(reactions)")
+            self._columns = {column[1] for column in self.cursor.fetchall()}
+        return self._columns
+
+    def _stmt_for(self, column_name):
+        """获取按 id 更新指定列的 SQL 语句
+        Args:
+            column_name: 要更新的列名
+        Returns:
+            UPDATE 语句字符串
+        Raises:
+            ValueError: 如果列名不存在于数据表中
+        """
+        stmt = self._update_stmts.get(column_name)
+        if stmt is None:
+            # 列名直接拼接进 SQL，需校验以防注入
+            if column_name not in self.get_columns():
+                raise ValueError(f"数据表中不存在列 {column_name}")
+            stmt = self._update_stmts.setdefault(column_name, f'UPDATE reactions SET "{column_name}" = ? WHERE id = ?')
+        return stmt
 
     def check_and_add_columns(self, columns):
         """根据列名检查列是否存在，并添加缺失的列
@@ -192,33 +254,39 @@ class DatabaseModule:
             column_name: 新列的名称
             input_list: 新的数据列表
         """
-        # 添加新列
-        self.add_column(column_name, column_type)
+        # 添加新列，不允许为 NULL（唯一索引中 NULL 互不相等），默认取第一个取值，
+        # 之后 fill_data 插入的行以默认值参与自然键，重复初始化时仍被 INSERT OR IGNORE 去重
+        self.add_column(column_name, column_type, default=input_list[0])
+
+        # 新特征取值与原数据正交后，原自然键不再唯一，唯一索引需包含新列
+        self.cursor.execute('PRAGMA index_info(reactions_natkey)')
+        natkey_columns = [column[2] for column in self.cursor.fetchall()]
+        self.cursor.execute('DROP INDEX IF EXISTS reactions_natkey')
 
         # 读取现有数据
         existing_data = self.read_data()
 
-        # 获取列名列表（不包括 id 列）
-        column_names = [column[0] for column in self.cursor.description if column[0] != 'id']
+        # 获取列名列表（id 列显式写入，保证主键从 1 开始连续编号）
+        column_names = [column[0] for column in self.cursor.description]
 
         # 删除原数据库中的所有内容
         self.cursor.execute('DELETE FROM reactions')
         self.connection.commit()
 
-        # 重置主键
-        self.cursor.execute('DELETE FROM sqlite_sequence WHERE name="reactions"')
-        self.connection.commit()
+        # 插入语句对每行相同，只构建一次
+        placeholders = ', '.join(['?'] * len(column_names))  # 创建占位符
+        insert_sql = f'INSERT INTO reactions ({", ".join(column_names)}) VALUES ({placeholders})'
 
-        # 遍历现有数据并添加新行
-        for row in existing_data:
-            for value in input_list:
-                new_row = list(row[1:-1]) + [value]  # 复制现有行（去掉 id 列）并添加新列的值
-                placeholders = ', '.join(['?'] * len(new_row))  # 创建占位符
-                self.cursor.execute(f'''
-                    INSERT INTO reactions ({', '.join(column_names)})
-                    VALUES ({placeholders})
-                ''', new_row)
+        # 遍历现有数据并添加新行，复制现有行（替换 id 列）并添加新列的值
+        new_rows = (
+            [new_id] + list(row[1:-1]) + [value]
+            for new_id, (row, value) in enumerate(itertools.product(existing_data, input_list), start=1)
+        )
+        self.cursor.executemany(insert_sql, new_rows)
         
+        if natkey_columns:
+            natkey_columns.append(column_name)
+            self.cursor.execute(f'CREATE UNIQUE INDEX reactions_natkey ON reactions({", ".join(natkey_columns)})')
         self.connection.commit()
 
     def get_column_list(self, column_name):
@@ -243,6 +311,19 @@ class DatabaseModule:
         row = self.cursor.fetchone()  # 获取单行数据
         return list(row) if row else None  # 返回行数据的列表或 None
 
+    def get_values_by_id(self, row_id, column_names):
+        """根据id一次查询获取多个列的值
+        Args:
+            row_id: 要查询的行的id
+            column_names: 要获取的列名列表
+        Returns:
+            列名到值的字典，如果没有找到该行则各列的值均为 None
+        """
+        query = f'SELECT {", ".join(column_names)} FROM reactions WHERE id = ?'
+        self.cursor.execute(query, (row_id,))
+        row = self.cursor.fetchone()  # 获取单行数据
+        return dict(zip(column_names, row if row else [None] * len(column_names)))
+
     def get_value_by_id(self, row_id, column_name):
         """根据id与列名获取单个值
         Args:
@@ -264,11 +345,7 @@ class DatabaseModule:
             column_name: 要更新的列名
             new_value: 新的值
         """
-        self.cursor.execute(f'''
-            UPDATE reactions
-            SET {column_name} = ?
-            WHERE id = ?
-        ''', (new_value, row_id))
+        self.cursor.execute(self._stmt_for(column_name), (new_value, row_id))
         self.connection.commit()
 
     def export_to_csv(self, csv_file_path = 'data/database/reaction.csv'):
@@ -281,8 +358,8 @@ class DatabaseModule:
             writer = csv.writer(csv_file)
             # 写入列名
             writer.writerow([column[0] for column in self.cursor.description])
-            # 写入数据
-            writer.writerows(data)
+            # 写入数据，二进制列转为 base64 文本
+            writer.writerows(_csv_safe(row) for row in data)
 
     def delete_database(self):
         """删除数据库文件
@@ -310,44 +387,39 @@ class DatabaseModule:
         self.check_and_add_columns({
             'product_smiles': 'TEXT',
             'byproduct_smiles': 'TEXT',
-            'reaction_index_dicts': 'TEXT'
+            'reaction_index_dicts': 'BLOB'
         })
         self.cursor.execute('SELECT id, reactant1_smiles, reactant2_smiles FROM reactions')
         reactions = self.cursor.fetchall()
 
-        # 创建一个缓存字典
-        reaction_cache = {}
-
-        for reaction in reactions:
-            id, reactant1_smile, reactant2_smile = reaction
-            # print(reaction)
-            # # 生成反应产物
-            # product_smiles_list, byproduct_smiles, atom_indices_dict_list = generate_reaction_smile(reactant1_smile, reactant2_smile)
-            
-            # 创建一个唯一的键用于缓存
-            reaction_key = reactant1_smile + reactant2_smile
-            
-            # 检查缓存中是否已有结果
-            if reaction_key not in reaction_cache:
-                # 生成反应产物
-                product_smiles_list, byproduct_smiles, atom_indices_dict_list = generate_reaction_smile(reactant1_smile, reactant2_smile)
-                # 将结果存入缓存
-                reaction_cache[reaction_key] = (product_smiles_list, byproduct_smiles, atom_indices_dict_list)
-            else:
-                # 从缓存中获取结果
-                product_smiles_list, byproduct_smiles, atom_indices_dict_list = reaction_cache[reaction_key]
-                
-            # 将生成物和副产物存储到数据库，列表转换为字符串，使用 ; 分隔
-            product_smiles = ';'.join(product_smiles_list)
-            reaction_index_str = encode_nested_structure_v2(atom_indices_dict_list)
-            
-            self.cursor.execute('''
-                UPDATE reactions
-                SET product_smiles = ?, byproduct_smiles = ?, reaction_index_dicts = ?
-                WHERE id = ?
-            ''', (product_smiles, byproduct_smiles, reaction_index_str, id))
-
-            self.connection.commit()
+        # 产物只由两种反应物决定，只对不重复的反应物组合生成一次
+        pairs = list(dict.fromkeys((reactant1_smile, reactant2_smile) for _, reactant1_smile, reactant2_smile in reactions))
+        cpu_count = os.cpu_count() or 1
+        if len(pairs) < 2 * cpu_count:
+            # 组合较少时进程池的启动开销不划算，在本进程中串行生成；
+            # 反应物 3D 构建最耗时，先批量构建并写入本进程缓存，后续 fill_data_properties 也无需重新构建
+            mols = MolecularModule.get_or_create_many([(r1, 'r1') for r1, _ in pairs] + [(r2, 'r2') for _, r2 in pairs])
+            results = {pair: generate_reaction_smile(r1_mol, r2_mol)
+                       for pair, r1_mol, r2_mol in zip(pairs, mols[:len(pairs)], mols[len(pairs):])}
+        else:
+            # RDKit 在 fork 出的子进程中不安全，与 get_or_create_many 一样使用 spawn 启动；
+            # 只向子进程传递 SMILES，分子在子进程中构建并缓存，子进程内产物枚举为串行，不会嵌套并行
+            max_workers = min(cpu_count, len(pairs))
+            with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+                results = dict(zip(pairs, executor.map(generate_reaction_smile_pair, pairs,
+                                                       chunksize=max(1, len(pairs) // (4 * max_workers)))))
+
+        # 将生成物和副产物存储到数据库，列表转换为字符串，使用 ; 分隔
+        encoded_results = {
+            pair: (';'.join(product_smiles_list), byproduct_smiles, encode_reaction_index_dicts(atom_indices_dict_list))
+            for pair, (product_smiles_list, byproduct_smiles, atom_indices_dict_list) in results.items()
+        }
+        self.cursor.executemany('''
+            UPDATE reactions
+            SET product_smiles = ?, byproduct_smiles = ?, reaction_index_dicts = ?
+            WHERE id = ?
+        ''', [(*encoded_results[(reactant1_smile, reactant2_smile)], id) for id, reactant1_smile, reactant2_smile in reactions])
+        self.connection.commit()
 
     def fill_data_properties(self, properties):
         """通过遍历列表初步填充数据
@@ -355,19 +427,20 @@ class DatabaseModule:
             properties: 需要存储的分子属性名列表
         """
         # 获取列名
-        self.cursor.execute("PRAGMA table_info(reactions)")
-        existing_columns = {column[1] for column in self.cursor.fetchall()}
+        existing_columns = self.get_columns()
+        # 按列名收集待更新的 (值, id)，最后批量写入
+        updates = {}
         # 执行查询以获取所有反应数据
         self.cursor.execute('SELECT id, reactant1_smiles, reactant2_smiles, solvent_smiles FROM reactions')
         # 获取所有行
         rows = self.cursor.fetchall()
         for row in rows:
             id, reactant1_smile, reactant2_smile, solvent_smile = row
-            mol_r1 = MolecularModule(reactant1_smile, 'r1')
+            mol_r1 = MolecularModule.get_or_create(reactant1_smile, 'r1')
             mol_r1.cal_mol_prop()
-            mol_r2 = MolecularModule(reactant2_smile, 'r2')
+            mol_r2 = MolecularModule.get_or_create(reactant2_smile, 'r2')
             mol_r2.cal_mol_prop()
-            mol_solvent = MolecularModule(solvent_smile, 'sol')
+            mol_solvent = MolecularModule.get_or_create(solvent_smile, 'sol')
             mol_solvent.cal_mol_prop()
             # 处理分子属性
             for prop in properties:
@@ -395,10 +468,13 @@ class DatabaseModule:
                         if column_name not in existing_columns:
                             self.add_column(column_name, column_type)
                             # 更新列名列表
-                            self.cursor.execute("PRAGMA table_info(reactions)")
-                            existing_columns = {column[1] for column in self.cursor.fetchall()}
+                            existing_columns = self.get_columns()
 
-                        self.update_value(id, column_name, value)
+                        updates.setdefault(column_name, []).append((value, id))
+
+        for column_name, params in updates.items():
+            self.cursor.executemany(self._stmt_for(column_name), params)
+        self.connection.commit()
         return
 
     def add_molecular_num(self, base_num = 250):
@@ -468,7 +544,7 @@ class DatabaseModule:
             property_values = []
 
             for smile in smiles_list:
-                mol = MolecularModule(smile, 'p')
+                mol = MolecularModule.get_or_create(smile, 'p')
                 property_value = getattr(mol, 'mol_functional_group')
                 property_values.append(property_value)
 
@@ -554,6 +630,46 @@ def split_nested(s):
 
     return result
 
+def _sql_literal(value):
+    """
+    将 Python 值转换为 SQL 字面量，用于列默认值。
+
+    Args:
+        value (int, float or str): 列默认值。
+
+    Returns:
+        str: SQL 字面量。
+    """
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return repr(value)
+
+def generate_reaction_smile_pair(pair):
+    """
+    根据反应物 SMILES 构建分子并生成反应产物，供进程池调用。
+
+    Args:
+        pair (tuple): (反应物1 SMILES, 反应物2 SMILES)。
+
+    Returns:
+        tuple: generate_reaction_smile 的返回值。
+    """
+    reactant1_smile, reactant2_smile = pair
+    return generate_reaction_smile(MolecularModule.get_or_create(reactant1_smile, 'r1'),
+                                   MolecularModule.get_or_create(reactant2_smile, 'r2'))
+
+def _csv_safe(row):
+    """
+    将数据行中的二进制值转换为 base64 字符串，以便写入 CSV。
+
+    Args:
+        row (tuple): 数据库中的一行数据。
+
+    Returns:
+        list: 可安全写入 CSV 的数据行。
+    """
+    return [base64.b64encode(value).decode('ascii') if isinstance(value, bytes) else value for value in row]
+
 def encode_nested_structure_v2(nested):
     """
     将嵌套列表或字典编码为字符串。
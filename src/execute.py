@@ -1,10 +1,178 @@
 # execute.py
 from AutoMapper.call_automapper import run_automapper_clean, run_automapper_map
 
+import functools
+import hashlib
+import importlib.metadata
 import logging
+import multiprocessing
 import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# 外部程序运行结果的缓存目录，默认关闭；设置环境变量 PYPA_CACHE_PATH 为目录路径开启，
+# 缓存不会自动清理，删除该目录即可清空
+CACHE_PATH = os.environ.get('PYPA_CACHE_PATH', '')
+
+# AutoMapper 源码目录，其中代码修改后缓存失效
+AUTOMAPPER_PATH = os.path.dirname(os.path.abspath(run_automapper_map.__code__.co_filename))
+
+# 外部程序所属的 Python 发行包，版本号参与缓存键
+_TOOL_DISTS = {'ltemplify.py': 'moltemplate', 'moltemplate.sh': 'moltemplate'}
+
+
+@functools.lru_cache(maxsize=None)
+def _tool_digest(tool):
+    """计算外部程序的版本哈希，程序升级或修改后缓存自动失效。
+
+    Args:
+        tool: 命令名，或 Python 源码目录（如 AUTOMAPPER_PATH）。
+
+    Returns:
+        str: 程序文件内容与发行包版本的哈希。
+    """
+    if os.path.isdir(tool):
+        files = sorted(os.path.join(tool, name) for name in os.listdir(tool) if name.endswith('.py'))
+    else:
+        path = shutil.which(tool)
+        files = [path] if path else []
+    h = hashlib.blake2b()
+    for file_name in files:
+        with open(file_name, 'rb') as file:
+            h.update(file.read())
+    dist = _TOOL_DISTS.get(tool)
+    if dist:
+        try:
+            h.update(importlib.metadata.version(dist).encode())
+        except importlib.metadata.PackageNotFoundError:
+            pass
+    return h.hexdigest()
+
+def _cache_key(key_files, argv, tool):
+    """根据输入文件内容、命令参数和外部程序版本计算缓存键。
+
+    Args:
+        key_files: 影响输出的输入文件路径列表。
+        argv: 命令参数（或函数参数），以 repr 参与哈希。
+        tool: 运行的外部程序，见 _tool_digest。
+
+    Returns:
+        str: 缓存键。
+    """
+    h = hashlib.blake2b()
+    h.update(_tool_digest(tool).encode())
+    for file_name in sorted(key_files):
+        h.update(os.path.basename(file_name).encode())
+        with open(file_name, 'rb') as file:
+            h.update(file.read())
+    h.update(repr(argv).encode())
+    return h.hexdigest()
+
+def _cache_restore(key, outputs):
+    """若缓存中存在全部输出文件，则复制回输出路径。
+
+    Returns:
+        bool: 是否命中缓存。
+    """
+    cache_dir = os.path.join(CACHE_PATH, key)
+    cached = [os.path.join(cache_dir, os.path.basename(output)) for output in outputs]
+    if not all(os.path.isfile(file_name) for file_name in cached):
+        return False
+    for file_name, output in zip(cached, outputs):
+        shutil.copyfile(file_name, output)
+    return True
+
+def _cache_lookup(key_files, argv, outputs, tool):
+    """计算缓存键并尝试从缓存恢复输出文件，缓存关闭时不读取任何文件。
+
+    Args:
+        key_files: 影响输出的输入文件路径列表。
+        argv: 命令参数（或函数参数）。
+        outputs: 运行后生成的输出文件路径列表。
+        tool: 运行的外部程序，见 _tool_digest。
+
+    Returns:
+        tuple: (是否命中缓存, 缓存键)，缓存关闭时缓存键为 None。
+    """
+    if not CACHE_PATH:
+        return False, None
+    key = _cache_key(key_files, argv, tool)
+    return _cache_restore(key, outputs), key
+
+def _cache_store(key, outputs):
+    """将输出文件保存到缓存中，先写入临时目录再重命名，避免并发写入半成品。
+
+    Args:
+        key: _cache_lookup 返回的缓存键，为 None 时不缓存。
+        outputs: 运行后生成的输出文件路径列表。
+    """
+    if key is None:
+        return
+    cache_dir = os.path.join(CACHE_PATH, key)
+    tmp_dir = f'{cache_dir}.tmp{os.getpid()}'
+    os.makedirs(tmp_dir, exist_ok=True)
+    for output in outputs:
+        shutil.copyfile(output, os.path.join(tmp_dir, os.path.basename(output)))
+    try:
+        os.replace(tmp_dir, cache_dir)
+    except OSError:
+        # 其他进程已写入相同结果
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def _memoized_exec(key_files, argv, outputs, run, tool):
+    """输入文件、参数和外部程序均未变化时直接复用缓存的输出，否则运行并缓存输出。
+
+    Args:
+        key_files: 影响输出的输入文件路径列表。
+        argv: 命令参数（或函数参数）。
+        outputs: 运行后生成的输出文件路径列表。
+        run: 无参数的可调用对象，执行实际的外部程序。
+        tool: 运行的外部程序，见 _tool_digest。
+
+    Returns:
+        bool: 是否命中缓存。
+    """
+    hit, key = _cache_lookup(key_files, argv, outputs, tool)
+    if hit:
+        return True
+    run()
+    _cache_store(key, outputs)
+    return False
+
+
+def _lt_imports(lt_files):
+    """读取 LT 文件中 import 的模板文件路径。
+
+    Args:
+        lt_files: LT 文件路径列表。
+
+    Returns:
+        list: import 的模板文件路径列表。
+    """
+    imports = []
+    for lt_file in lt_files:
+        with open(lt_file, 'r') as file:
+            for line in file:
+                if line.startswith('import '):
+                    imports.append(line.split(None, 1)[1].strip().strip('"'))
+    return imports
+
+def ltemplify_argv(data_PATH, name):
+    """构建 ltemplify 命令参数列表。
+
+    Args:
+        data_PATH: 分子 DATA 文件的路径。
+        name: 分子名称。
+
+    Returns:
+        list: ltemplify 命令参数列表。
+    """
+    return ['ltemplify.py', '-name', f'{name} inherits GAFF2', '-molid', '1',
+            '-ignore-coeffs', '-ignore-angles', '-ignore-bond-types', '-ignore-masses',
+            os.path.join(data_PATH, f'{name}.data')]
 
 def exec_ltemplify(data_PATH, lt_PATH, name):
     """根据分子 DATA 文件生成分子 LT 分子模板文件并指认 GAFF2 力场。
@@ -14,22 +182,57 @@ def exec_ltemplify(data_PATH, lt_PATH, name):
         lt_PATH: 输出 LAMMPS 模板文件的路径。
         name: 分子名称。
     """
-    data_str = '.data'
-    lt_str = '.lt'
-    str_list = []
-    
-    str_list.append(f'ltemplify.py -name "{name} inherits GAFF2" -molid "1"  -ignore-coeffs -ignore-angles -ignore-bond-types -ignore-masses {data_PATH}{name}{data_str} > {lt_PATH}{name}{lt_str}\n')
-    # 将命令写入到脚本文件
-    with open(lt_PATH + 'ltemplify_my.sh', 'w') as file:
-        file.writelines(str_list)
+    argv = ltemplify_argv(data_PATH, name)
+
+    def run():
+        # 直接调用 ltemplify，标准输出写入 LT 文件，不再经过 shell 脚本
+        with open(os.path.join(lt_PATH, f'{name}.lt'), 'wb') as file:
+            subprocess.run(argv, stdout=file, stderr=subprocess.DEVNULL, check=True)
 
     try:
-        os.system(f'. {lt_PATH}ltemplify_my.sh > /dev/null 2>&1')
+        _memoized_exec([os.path.join(data_PATH, f'{name}.data')], argv, [os.path.join(lt_PATH, f'{name}.lt')], run, 'ltemplify.py')
         logging.info(f"构建{name} lt文件完成")
     except Exception as e:
         logging.error(f"构建lt文件出错: {e}")
         raise
-    # os.remove(f"{lt_PATH}{name}{data_str}")
+    # os.remove(f"{lt_PATH}{name}.data")
+
+def exec_ltemplify_list(data_PATH, lt_PATH, name_list):
+    """并行生成多个分子的 LT 分子模板文件，同时运行的 ltemplify 进程数不超过 CPU 核数。
+    
+    Args:
+        data_PATH: 分子 DATA 文件的路径。
+        lt_PATH: 输出 LAMMPS 模板文件的路径。
+        name_list: 分子名称列表。
+    """
+    # 输入未变化的分子直接复用缓存的 LT 文件
+    lookups = {name: _cache_lookup([os.path.join(data_PATH, f'{name}.data')], ltemplify_argv(data_PATH, name),
+                                   [os.path.join(lt_PATH, f'{name}.lt')], 'ltemplify.py')
+               for name in name_list}
+    pending = [name for name in name_list if not lookups[name][0]]
+
+    def run(name):
+        with open(os.path.join(lt_PATH, f'{name}.lt'), 'wb') as file:
+            return subprocess.run(ltemplify_argv(data_PATH, name), stdout=file, stderr=subprocess.DEVNULL).returncode
+
+    # ltemplify 为外部进程，线程只负责等待
+    failed = []
+    with ThreadPoolExecutor(max_workers=max(1, min(os.cpu_count() or 1, len(pending)))) as executor:
+        futures = {executor.submit(run, name): name for name in pending}
+        for future in as_completed(futures):
+            try:
+                if future.result() != 0:
+                    failed.append(futures[future])
+            except Exception as e:
+                logging.error(f"构建lt文件出错: {e}")
+                raise
+
+    if failed:
+        logging.error(f"构建lt文件出错: {', '.join(failed)}")
+        raise RuntimeError(f"ltemplify 运行失败: {', '.join(failed)}")
+    for name in pending:
+        _cache_store(lookups[name][1], [os.path.join(lt_PATH, f'{name}.lt')])
+    logging.info(f"构建{', '.join(name_list)} lt文件完成")
 
 def exec_packmol(sys_PATH):
     """运行 Packmol 以建立分子系统模型。
@@ -37,14 +240,17 @@ def exec_packmol(sys_PATH):
     Args:
         sys_PATH: Packmol 输入文件的路径。
     """
-    with open(sys_PATH + 'run_packmol.sh', 'w') as file:
-        file.write(f'packmol < {sys_PATH}system.inp')
+    # 直接调用 packmol，输入文件通过标准输入传入，不再生成 run_packmol.sh
     try:
         logging.info("等待packmol运行...")
-        os.system(f'. {sys_PATH}run_packmol.sh > /dev/null 2>&1')
+        with open(os.path.join(sys_PATH, 'system.inp'), 'rb') as file:
+            result = subprocess.run(['packmol'], stdin=file, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
     except Exception as e:
         logging.error(f"packmol运行失败: {e}")
         raise
+    # packmol 未找到完美堆积时也会返回非零值并写出结果，仅记录警告
+    if result.returncode != 0:
+        logging.warning(f"packmol 返回码 {result.returncode}")
     return
 
 def exec_moltemplate_system(lt_PATH, sys_PATH, data_PATH):
@@ -55,27 +261,22 @@ def exec_moltemplate_system(lt_PATH, sys_PATH, data_PATH):
         sys_PATH: 系统文件的路径。
         data_PATH: 输出数据文件的路径。
     """
-    # 使用 str_list 列表构建命令内容
-    str_list = []
-    str_list.append(f'moltemplate.sh -pdb {sys_PATH}system.pdb -atomstyle "full" {lt_PATH}system.lt\n')
-
-    # 将命令写入到脚本文件
-    with open(data_PATH + 'run_moltemplate_system.sh', 'w') as file:
-        file.writelines(str_list)
+    argv = ['moltemplate.sh', '-pdb', os.path.join(sys_PATH, 'system.pdb'), '-atomstyle', 'full', os.path.join(lt_PATH, 'system.lt')]
 
-    tmp_PATH = os.getcwd()
-    os.chdir(data_PATH)
+    def run():
+        # 直接调用 moltemplate 并丢弃输出信息，通过 cwd 指定输出目录
+        subprocess.run(argv, cwd=data_PATH, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        shutil.rmtree(os.path.join(data_PATH, 'output_ttree'), ignore_errors=True)
 
-    # 执行脚本并丢弃输出信息
+    # system.lt 导入的分子模板也纳入缓存键
+    lt_file = os.path.join(lt_PATH, 'system.lt')
+    key_files = [os.path.join(sys_PATH, 'system.pdb'), lt_file] + [name for name in _lt_imports([lt_file]) if os.path.isfile(name)]
     try:
         logging.info("等待构建系统 DATA 文件...")
-        os.system(f'. {data_PATH}run_moltemplate_system.sh > /dev/null 2>&1')
+        _memoized_exec(key_files, argv, [os.path.join(data_PATH, 'system.data'), os.path.join(data_PATH, 'system.in.settings')], run, 'moltemplate.sh')
     except Exception as e:
         logging.error(f"构建系统模板出错: {e}")
         raise
-
-    os.chdir(tmp_PATH)
-    os.system(f'rm -rf {data_PATH}output_ttree')
     return
 
 def exec_moltemplate_reaction(lt_PATH, data_PATH, map_name):
@@ -86,39 +287,44 @@ def exec_moltemplate_reaction(lt_PATH, data_PATH, map_name):
         data_PATH: 输出数据文件的路径。
         map_name: 反应模板名称。
     """
-    # 使用 str_list 列表构建命令内容
-    str_list = []
-    str_list.append(f'moltemplate.sh -atomstyle "full" {lt_PATH}pre_{map_name}.lt\n')
-    str_list.append(f'moltemplate.sh -atomstyle "full" {lt_PATH}post_{map_name}.lt\n')
+    lt_files = [os.path.join(lt_PATH, f'{prefix}_{map_name}.lt') for prefix in ('pre', 'post')]
+    argv_list = [['moltemplate.sh', '-atomstyle', 'full', lt_file] for lt_file in lt_files]
+    outputs = [os.path.join(data_PATH, f'{prefix}_{map_name}.data') for prefix in ('pre', 'post')]
 
-    # 将命令写入到脚本文件
-    with open(data_PATH + 'run_moltemplate_reaction.sh', 'w') as file:
-        file.writelines(str_list)
+    def run():
+        # moltemplate 会在工作目录写入 output_ttree 等中间文件，每次在独立的临时目录中运行，
+        # 只把 DATA 文件移回 data_PATH，不需要的 .in 等文件随临时目录删除，同时保证可并行运行
+        with tempfile.TemporaryDirectory(dir=data_PATH) as tmp_PATH:
+            for argv, output in zip(argv_list, outputs):
+                subprocess.run(argv, cwd=tmp_PATH, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+                os.replace(os.path.join(tmp_PATH, os.path.basename(output)), output)
 
-    tmp_PATH = os.getcwd()
-    os.chdir(data_PATH)
-
-    # 执行脚本并丢弃输出信息
+    # 反应模板导入的分子模板也纳入缓存键
+    key_files = lt_files + [lt_file for lt_file in _lt_imports(lt_files) if os.path.isfile(lt_file)]
     try:
-        logging.info("等待构建反应模板 DATA 文件...")
-        os.system(f'. {data_PATH}run_moltemplate_reaction.sh > /dev/null 2>&1')
+        logging.info(f"等待构建反应模板 {map_name} DATA 文件...")
+        _memoized_exec(key_files, argv_list, outputs, run, 'moltemplate.sh')
         logging.info(f"构建反应模板 {map_name} DATA 文件完成...")
     except Exception as e:
         logging.error(f"构建反应模板DATA出错: {e}")
         raise
-
-    # 删除不需要的文件
-    os.remove(f'pre_{map_name}.in')
-    os.remove(f'pre_{map_name}.in.init')
-    os.remove(f'pre_{map_name}.in.settings')
-
-    os.remove(f'post_{map_name}.in')
-    os.remove(f'post_{map_name}.in.init')
-    os.remove(f'post_{map_name}.in.settings')
-
-    os.chdir(tmp_PATH)
     return
 
+def exec_moltemplate_reaction_list(lt_PATH, data_PATH, map_name_list):
+    """并行构建多个反应模板的反应前后 LAMMPS DATA 文件。
+    
+    Args:
+        lt_PATH: LAMMPS 模板文件的路径。
+        data_PATH: 输出数据文件的路径。
+        map_name_list: 反应模板名称列表。
+    """
+    # 各反应模板相互独立，moltemplate 为外部进程，线程只负责等待
+    map_name_list = list(map_name_list)
+    with ThreadPoolExecutor(max_workers=max(1, min(os.cpu_count() or 1, len(map_name_list)))) as executor:
+        futures = [executor.submit(exec_moltemplate_reaction, lt_PATH, data_PATH, map_name) for map_name in map_name_list]
+        for future in as_completed(futures):
+            future.result()
+
 def exec_AutoMapper_clean(data_PATH, map_PATH, map_name_list):
     """清理反应模板 DATA 文件并整理力场信息。
     
@@ -126,33 +332,33 @@ def exec_AutoMapper_clean(data_PATH, map_PATH, map_name_list):
         data_PATH: 数据文件的路径。
         map_PATH: 映射文件的路径。
     """
-    data_files = []
-    for map_name in map_name_list:
-        data_files = data_files + [f'pre_{map_name}.data'] + [f'post_{map_name}.data']
-    data_files = data_files + ['system.data']
-    tmp_PATH = os.getcwd()
-    os.chdir(data_PATH)
+    data_files = [f'{prefix}_{map_name}.data' for map_name in map_name_list for prefix in ('pre', 'post')]
+    data_files.append('system.data')
 
     # 直接调用Python函数而不是通过shell脚本
     try:
         logging.info("清理反应模板 DATA 文件...")
-        run_automapper_clean(
-            directory=".",  # 使用当前目录(已切换到data_PATH)
-            data_files=data_files,
-            coeff_file="system.in.settings"
-        )
+        def run():
+            # AutoMapper 内部会切换工作目录，在子进程中运行以保持当前进程的工作目录不变
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+                executor.submit(
+                    run_automapper_clean,
+                    directory=data_PATH,
+                    data_files=data_files,
+                    coeff_file="system.in.settings"
+                ).result()
+
+        input_files = data_files + ['system.in.settings']
+        _memoized_exec([os.path.join(data_PATH, file_name) for file_name in input_files], ('automapper_clean', data_files),
+                       [os.path.join(data_PATH, f'cleaned{file_name}') for file_name in input_files], run, AUTOMAPPER_PATH)
         logging.info("整理力场信息完成")
+        # 复制清理后的文件到映射目录
+        for map_name in map_name_list:
+            for prefix in ('pre', 'post'):
+                shutil.copyfile(os.path.join(data_PATH, f'cleaned{prefix}_{map_name}.data'), os.path.join(map_PATH, f'clean_{prefix}_{map_name}.data'))
     except Exception as e:
         logging.error(f"清理文件力场出错: {e}")
         raise
-    finally:
-        # 复制清理后的文件到映射目录
-        for map_name in map_name_list:
-            os.system(f'cp "{data_PATH}cleanedpre_{map_name}.data" "{map_PATH}clean_pre_{map_name}.data"')
-            os.system(f'cp "{data_PATH}cleanedpost_{map_name}.data" "{map_PATH}clean_post_{map_name}.data"')
-        
-        # 恢复原始工作目录
-        os.chdir(tmp_PATH)
 
 
 # def exec_AutoMapper2(map_PATH, reaction_index_dicts_list, atom_ele_type_str):
@@ -195,43 +401,55 @@ def exec_AutoMapper(map_PATH, map_name_list, reaction_index_dicts_list, atom_ele
         reaction_index_dicts_list: 反应索引字典列表。
         atom_ele_type_str: 原子元素类型字符串。
     """
-    # 保存当前工作目录
-    tmp_PATH = os.getcwd()
-    
-    try:
-        # 切换到映射目录
-        os.chdir(map_PATH)
-        
-        for reaction_index_dict, map_name in zip(reaction_index_dicts_list, map_name_list):
+    # 先检查缓存，输入和参数未变化的反应直接复用缓存的映射文件
+    pending = []
+    for reaction_index_dict, map_name in zip(reaction_index_dicts_list, map_name_list):
+        kwargs = dict(
+            pre_reaction_file=f"clean_pre_{map_name}.data",  # 使用exec_AutoMapper_clean生成的文件
+            post_reaction_file=f"clean_post_{map_name}.data",  # 使用exec_AutoMapper_clean生成的文件
+            pre_save_name=f"mol.pre_{map_name}",
+            post_save_name=f"mol.post_{map_name}",
+            bonding_atoms=[
+                str(reaction_index_dict['N_r']),
+                str(reaction_index_dict['C_r']),
+                str(reaction_index_dict['N_p']),
+                str(reaction_index_dict['C_p'])
+            ],
+            elements_by_type=atom_ele_type_str.split(),
+            delete_atoms=[
+                str(reaction_index_dict['Cl_d']),
+                str(reaction_index_dict['H_d']),
+                str(reaction_index_dict['Cl_p']),
+                str(reaction_index_dict['H_p'])
+            ],
+            debug=False,
+            map_file_name=f"txt.{map_name}"
+        )
+        outputs = [os.path.join(map_PATH, kwargs[k]) for k in ('pre_save_name', 'post_save_name', 'map_file_name')]
+        hit, key = _cache_lookup([os.path.join(map_PATH, f'clean_pre_{map_name}.data'), os.path.join(map_PATH, f'clean_post_{map_name}.data')],
+                                 kwargs, outputs, AUTOMAPPER_PATH)
+        if hit:
+            logging.info(f"处理反应 {map_name} 完成（使用缓存）")
+            continue
+        pending.append((map_name, kwargs, key, outputs))
+    if not pending:
+        return
+
+    # 各反应的映射相互独立，在多进程中并行处理；AutoMapper 内部会切换工作目录，进程隔离保证互不影响
+    with ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, len(pending)),
+                             mp_context=multiprocessing.get_context('spawn')) as executor:
+        futures = {}
+        for map_name, kwargs, key, outputs in pending:
+            logging.info(f"自动映射，处理反应 {map_name} 中...")
+            future = executor.submit(run_automapper_map, directory=map_PATH, **kwargs)
+            futures[future] = (map_name, key, outputs)
+
+        for future in as_completed(futures):
+            map_name, key, outputs = futures[future]
             try:
-                logging.info(f"自动映射，处理反应 {map_name} 中...")
-                run_automapper_map(
-                    directory=".",  # 使用当前目录(已切换到map_PATH)
-                    pre_reaction_file=f"clean_pre_{map_name}.data",  # 使用exec_AutoMapper_clean生成的文件
-                    post_reaction_file=f"clean_post_{map_name}.data",  # 使用exec_AutoMapper_clean生成的文件
-                    pre_save_name=f"mol.pre_{map_name}",
-                    post_save_name=f"mol.post_{map_name}",
-                    bonding_atoms=[
-                        str(reaction_index_dict['N_r']),
-                        str(reaction_index_dict['C_r']),
-                        str(reaction_index_dict['N_p']),
-                        str(reaction_index_dict['C_p'])
-                    ],
-                    elements_by_type=atom_ele_type_str.split(),
-                    delete_atoms=[
-                        str(reaction_index_dict['Cl_d']),
-                        str(reaction_index_dict['H_d']),
-                        str(reaction_index_dict['Cl_p']),
-                        str(reaction_index_dict['H_p'])
-                    ],
-                    debug=False,
-                    map_file_name=f"txt.{map_name}"
-                )
+                future.result()
+                _cache_store(key, outputs)
                 logging.info(f"处理反应 {map_name} 完成")
             except Exception as e:
                 logging.error(f"处理反应 {map_name} 时出错: {e}")
                 raise
-                
-    finally:
-        # 确保无论是否出错都恢复原始工作目录
-        os.chdir(tmp_PATH)
\ No newline at end of file
@@ -1,8 +1,13 @@
 # filewriter.py
+import functools
+import numbers
+import os
 
 def write_file(file_PATH, file_name, str_list):
-    with open(file_PATH + file_name, 'w') as file:
-        file.writelines(str_list)
+    # 先拼接再一次性以二进制写入，避免逐行编码和多次 write 调用
+    data = ''.join(str_list)
+    with open(os.path.join(file_PATH, file_name), 'wb') as file:
+        file.write(data.encode('utf-8'))
 
 def write_sys_lt_str(lt_PATH, name_list, num_list, box_len = 0):
     """生成 LT 系统模板文件的字符串内容。
@@ -10,26 +15,38 @@ def write_sys_lt_str(lt_PATH, name_list, num_list, box_len = 0):
     Args:
         name_list: 模板分子的名称列表。
         num_list: 模板分子的数量列表。
+        box_len: 模拟盒子的边长，为 0 时不写入边界块。
     
     Returns:
         str_list: 文件的多行字符串列表。
+
+    Raises:
+        ValueError: box_len 不是非负数时。
     """
+    # 边界块由 box_len 生成，在运行 moltemplate 之前检查输入，而不是检查生成的内容
+    if not isinstance(box_len, numbers.Real) or not box_len >= 0:
+        raise ValueError(f"box_len 须为非负数，实际为: {box_len!r}")
+    return [_write_sys_lt_str_cached(lt_PATH, tuple(name_list), tuple(num_list), box_len)]
+
+@functools.lru_cache(maxsize=256)
+def _write_sys_lt_str_cached(lt_PATH, name_tuple, num_tuple, box_len):
+    # 相同输入的 LT 内容只构建一次，返回拼接好的字符串
     str_list = []
     str_list.append('import "gaff2.lt"\n')
-    for i in name_list:
-        str_list.append(f'import "{lt_PATH}{i}.lt"\n')
+    for i in name_tuple:
+        str_list.append(f'import "{os.path.join(lt_PATH, i)}.lt"\n')
     str_list.append('\n')
-    for i,j in zip(name_list, num_list):
+    for i,j in zip(name_tuple, num_tuple):
         if j:
             str_list.append(f'mol_{i} = new {i} [{j}]\n')
 
     if box_len:
         str_list.append('\nwrite_once("Data Boundary") {\n')
-        str_list.append(f'    0.0 {box_len} xlo xhi\n')
-        str_list.append(f'    0.0 {box_len} ylo yhi\n')
-        str_list.append(f'    0.0 {box_len} zlo zhi\n')
+        # 按坐标轴生成边界行，保证 x/y/z 各出现一次
+        for axis in 'xyz':
+            str_list.append(f'    0.0 {box_len} {axis}lo {axis}hi\n')
         str_list.append('}\n')
-    return str_list
+    return ''.join(str_list)
 
 def write_react_lt(lt_PATH, map_file_name, name_list):
     """生成 LT 反应前后模板文件。
@@ -43,7 +60,7 @@ def write_react_lt(lt_PATH, map_file_name, name_list):
     str_list = []
     str_list.append('import "gaff2.lt"\n')
     for i in name_list:
-        str_list.append(f'import "{lt_PATH}{i}.lt"\n')
+        str_list.append(f'import "{os.path.join(lt_PATH, i)}.lt"\n')
     str_list.append('\n')
     str_list.append(f'mol_{name_list[0]} = new {name_list[0]}\n')
     str_list.append(f'mol_{name_list[1]} = new {name_list[1]}.move(0.0, 0.0, 5.0)\n')
@@ -86,125 +103,143 @@ def write_packmol_inp(sys_PATH, mol_PATH, mol_list, mol_num_list, box_len, file_
         mol_num_list: 每种分子的数量列表。
         box_len: 系统的盒子长度。
     """
-    str_list = []
-    str_list.append('nloop0 1000\n')
-    str_list.append('tolerance 2.0\n')
-    str_list.append(f'filetype {file_type}\n')
-    str_list.append(f'output {sys_PATH}{output_name}.{file_type}\n')
-    str_list.append(f'add_box_sides {box_len}\n')
-    
-    for i,j in zip(mol_list, mol_num_list):
-        # 数量必须大于 0 才不报错
-        if j:
-            str_list.append(f'structure {mol_PATH}{i}.{file_type}\n')
-            str_list.append(f'  number {j}\n')
-            str_list.append(f'  inside box 0. 0. 0. {box_len}. {box_len}. {box_len}.\n')
-            str_list.append(f'end structure\n')
-    
-    write_file(sys_PATH, 'system.inp', str_list)
+    header = (
+        'nloop0 1000\n'
+        'tolerance 2.0\n'
+        f'filetype {file_type}\n'
+        f'output {os.path.join(sys_PATH, output_name)}.{file_type}\n'
+        f'add_box_sides {box_len}\n'
+    )
+    # 数量必须大于 0 才不报错
+    body = ''.join(
+        f'structure {os.path.join(mol_PATH, i)}.{file_type}\n'
+        f'  number {j}\n'
+        f'  inside box 0. 0. 0. {box_len}. {box_len}. {box_len}.\n'
+        'end structure\n'
+        for i, j in zip(mol_list, mol_num_list) if j
+    )
+
+    write_file(sys_PATH, 'system.inp', [header, body])
     return
 
 
-def write_lammps_in(data_PATH, map_PATH, run_PATH):
-    """生成 LAMMPS 输入文件以进行模拟。
-    
-    Args:
-        data_PATH: 数据文件的路径。
-        map_PATH: 映射文件的路径。
-        run_PATH: LAMMPS 输入文件的输出路径。
-    """
-    # 使用 str_list 列表构建输入文件内容
-    str_list = []
-    str_list.append("# ----------------- Init Section -----------------\n")
-    str_list.append("units           real\n")
-    str_list.append("atom_style      full\n")
-    str_list.append("bond_style      hybrid harmonic\n")
-    str_list.append("angle_style     hybrid harmonic\n")
-    str_list.append("dihedral_style  hybrid fourier\n")
-    str_list.append("improper_style  hybrid cvff\n")
-    str_list.append("pair_style      hybrid lj/charmm/coul/long 9.0 10.0 10.0\n")
-    str_list.append("kspace_style    pppm 0.0001\n\n")
+# LAMMPS 输入文件模板，{data_PATH}/{map_PATH} 在 write_lammps_in 中填充
+_LAMMPS_IN_TEMPLATE = """# ----------------- Init Section -----------------
+units           real
+atom_style      full
+bond_style      hybrid harmonic
+angle_style     hybrid harmonic
+dihedral_style  hybrid fourier
+improper_style  hybrid cvff
+pair_style      hybrid lj/charmm/coul/long 9.0 10.0 10.0
+kspace_style    pppm 0.0001
 
-    str_list.append("pair_modify     mix arithmetic\n")
-    str_list.append("special_bonds   amber\n")
-    str_list.append("# ----------------- Atom Definition Section -----------------\n")
-    str_list.append(f'read_data "{data_PATH}cleanedsystem.data"\n')
-    str_list.append("# ----------------- Settings Section -----------------\n")
-    str_list.append(f'include "{data_PATH}cleanedsystem.in.settings"\n')
-    str_list.append("# ----------------- Simulation -----------------\n\n")
+pair_modify     mix arithmetic
+special_bonds   amber
+# ----------------- Atom Definition Section -----------------
+read_data "{data_PATH}cleanedsystem.data"
+# ----------------- Settings Section -----------------
+include "{data_PATH}cleanedsystem.in.settings"
+# ----------------- Simulation -----------------
 
-    str_list.append(f'molecule        pre {map_PATH}pre_mol.data\n')
-    str_list.append(f'molecule        post {map_PATH}post_mol.data\n\n')
+molecule        pre {map_PATH}pre_mol.data
+molecule        post {map_PATH}post_mol.data
 
-    str_list.append("neighbor        2.5 bin\n")
-    str_list.append("neigh_modify    every 1 delay 0 check yes\n\n")
+neighbor        2.5 bin
+neigh_modify    every 1 delay 0 check yes
 
-    str_list.append("group           MPD molecule <> 1 100 \n")
-    str_list.append("group           TMC molecule <> 101 250 \n\n")
+group           MPD molecule <> 1 100 
+group           TMC molecule <> 101 250 
 
-    str_list.append("velocity        all create 300.0 4928459 rot yes dist gaussian \n\n")
+velocity        all create 300.0 4928459 rot yes dist gaussian 
 
-    str_list.append("min_style       cg\n")
-    str_list.append("minimize        1e-05 1e-05 10000 100000\n\n")
+min_style       cg
+minimize        1e-05 1e-05 10000 100000
 
-    str_list.append("timestep        1.0\n")
-    str_list.append("fix             relax_md all nvt temp 298.15 298.15 100.0 \n")
-    str_list.append("run             3000\n")
-    str_list.append("unfix relax_md\n\n")
+timestep        1.0
+fix             relax_md all nvt temp 298.15 298.15 100.0 
+run             3000
+unfix relax_md
 
-    str_list.append("dump            mydump1 all xtc 100 traj_npt.xtc\n\n")
+dump            mydump1 all xtc 100 traj_npt.xtc
 
-    str_list.append("timestep        1.0\n")
-    str_list.append("fix             npt_md all npt temp 298.15 298.15 100.0 iso 1.0 1.0 1000.0 \n")
-    str_list.append("run             5000\n")
-    str_list.append("unfix npt_md\n\n")
+timestep        1.0
+fix             npt_md all npt temp 298.15 298.15 100.0 iso 1.0 1.0 1000.0 
+run             5000
+unfix npt_md
 
-    str_list.append("fix             xlink_fix all bond/react stabilization yes statted_grp .03 &\n")
-    str_list.append("                    react rxn1 all 100 0.0 10.0 pre post {map_PATH}automap.data stabilize_steps 100\n")
-    str_list.append("fix             nvt_md all nvt temp 298.15 298.15 100.0\n")
-    str_list.append("run             100000\n\n")
+fix             xlink_fix all bond/react stabilization yes statted_grp .03 &
+                    react rxn1 all 100 0.0 10.0 pre post {map_PATH}automap.data stabilize_steps 100
+fix             nvt_md all nvt temp 298.15 298.15 100.0
+run             100000
 
-    str_list.append("thermo          100\n\n")
+thermo          100
 
-    str_list.append("write_restart   system_after_npt.rst\n")
-    str_list.append("write_data      system.data\n\n")
+write_restart   system_after_npt.rst
+write_data      system.data
 
-    str_list.append("# write_dump      all custom pysimm.dump.tmp id q x y z vx vy vz\n")
-    str_list.append("quit\n")
+# write_dump      all custom pysimm.dump.tmp id q x y z vx vy vz
+quit
+"""
+
+def write_lammps_in(data_PATH, map_PATH, run_PATH):
+    """生成 LAMMPS 输入文件以进行模拟。
+    
+    Args:
+        data_PATH: 数据文件的路径。
+        map_PATH: 映射文件的路径。
+        run_PATH: LAMMPS 输入文件的输出路径。
+    """
+    # os.path.join(x, '') 保证目录以分隔符结尾，与模板中的文件名直接拼接
+    content = _LAMMPS_IN_TEMPLATE.format(data_PATH=os.path.join(data_PATH, ''), map_PATH=os.path.join(map_PATH, ''))
 
     # 将构建的内容写入 LAMMPS 输入文件
-    write_file(run_PATH, 'in.system', str_list)
+    write_file(run_PATH, 'in.system', [content])
 
 
 def combin_files(run_PATH):
-    # 读取 system.data 的内容
-    with open(f'{run_PATH}system.data', 'r') as infile:
-        data_lines = infile.readlines()
-
-    # 读取 system.in.settings 的内容
-    with open(f'{run_PATH}system.in.settings', 'r') as infile:
-        settings_lines = infile.readlines()
-
-    # settings_lines 标签格式化
-    settings_lines = convert_to_label_format(settings_lines)
-    # 找到 Atoms 标签的位置
-    atoms_index = None
-    for index, line in enumerate(data_lines):
-        if line.strip() == "Atoms":
-            atoms_index = index
-            break
-
-    # 如果找到了 Atoms 标签，则插入 settings_lines
-    if atoms_index is not None:
-        # 在 Atoms 标签之前插入 settings_lines
-        data_lines[atoms_index:atoms_index] = settings_lines
-
-    # 将合并后的内容写入新的文件
-    with open(f'{run_PATH}sys_init.lmps', 'w') as outfile:
-        outfile.writelines(data_lines)
+    """
+    将 system.in.settings 标签格式化后插入 system.data，合并为 sys_init.lmps。
+
+    Args:
+        run_PATH: 输入输出文件所在目录
+
+    Returns:
+        str: sys_init.lmps 第一节之前的头部内容，供解析体系信息时无需重新读取文件
+    """
+    # 读取 system.in.settings 的内容并标签格式化
+    with open(os.path.join(run_PATH, 'system.in.settings'), 'r') as infile:
+        settings_str = convert_to_label_format(infile.readlines())
+
+    # 逐行流式写出 system.data，在第一个 Atoms 标签之前插入 settings，同时保留头部
+    inserted = False
+    in_header = True
+    header = []
+    with open(os.path.join(run_PATH, 'system.data'), 'r') as infile, open(os.path.join(run_PATH, 'sys_init.lmps'), 'w') as outfile:
+        for line in infile:
+            stripped = line.strip()
+            if in_header:
+                # 节关键词为纯字母，遇到第一个节关键词时头部结束
+                if stripped.isalpha():
+                    in_header = False
+                else:
+                    header.append(line)
+            if not inserted and stripped == "Atoms":
+                outfile.write(settings_str)
+                inserted = True
+            outfile.write(line)
+    return ''.join(header)
+
+# 各 coeff 行需保留的字段下标（类型和参数），None 表示保留类型及其后全部参数
+_COEFF_FIELDS = {
+    "pair_coeff": (1, 4, 5),
+    "bond_coeff": (1, 3, 4),
+    "angle_coeff": (1, 3, 4),
+    "dihedral_coeff": None,
+    "improper_coeff": (1, 3, 4, 5),
+}
 
 def convert_to_label_format(data):
-    data = remove_comments(data)
     # 分区
     sections = {
         "pair_coeff": [],
@@ -214,59 +249,44 @@ def convert_to_label_format(data):
         "improper_coeff": []
     }
 
-    # 按行处理输入数据
-    for line in data.strip().split('\n'):
-        line = line.strip()
-        if line.startswith("pair_coeff"):
-            parts = line.split()
-            sections["pair_coeff"].append((parts[1], parts[4], parts[5]))  # 只保留类型和参数
-        elif line.startswith("bond_coeff"):
-            parts = line.split()
-            sections["bond_coeff"].append((parts[1], parts[3], parts[4]))  # 保留类型和参数
-        elif line.startswith("angle_coeff"):
-            parts = line.split()
-            sections["angle_coeff"].append((parts[1], parts[3], parts[4]))  # 保留类型和参数
-        elif line.startswith("dihedral_coeff"):
-            parts = line.split()
-            sections["dihedral_coeff"].append((parts[1], *parts[3:]))  # 保留类型和参数
-        elif line.startswith("improper_coeff"):
-            parts = line.split()
-            sections["improper_coeff"].append((parts[1], parts[3], parts[4], parts[5]))  # 保留类型和参数
-
-    # 输出结果
-    output = []
-
-    # Pair Coeffs
-    output.append("Pair Coeffs\n\n")
-    for idx, (type1, epsilon, sigma) in enumerate(sections["pair_coeff"], start=1):
-        output.append(f"{idx} {epsilon} {sigma}\n")
-
-    # Bond Coeffs
-    output.append("\nBond Coeffs\n\n")
-    for idx, (type1, k, r0) in enumerate(sections["bond_coeff"], start=1):
-        output.append(f"{idx} {k} {r0}\n")
-
-    # Angle Coeffs
-    output.append("\nAngle Coeffs\n\n")
-    for idx, (type1, k, theta0) in enumerate(sections["angle_coeff"], start=1):
-        output.append(f"{idx} {k} {theta0}\n")
-
-    # Dihedral Coeffs
-    output.append("\nDihedral Coeffs\n\n")
-    for idx, (type1, *params) in enumerate(sections["dihedral_coeff"], start=1):
-        output.append(f"{idx} " + " ".join(params) + "\n")
-
-    # Improper Coeffs
-    output.append("\nImproper Coeffs\n\n")
-    for idx, (type1, k, phi0, phi1) in enumerate(sections["improper_coeff"], start=1):
-        output.append(f"{idx} {k} {phi0} {phi1}\n")
-
-    output.append("\n")
-    
-    return "".join(output)
+    # 按行处理输入数据，每行只 split 一次，按行首关键字查表取字段
+    for line in remove_comments(data):
+        parts = line.split()
+        if not parts or parts[0] not in _COEFF_FIELDS:
+            continue
+        fields = _COEFF_FIELDS[parts[0]]
+        if fields is None:
+            # dihedral 参数个数不定，保留类型和其后全部参数
+            sections[parts[0]].append((parts[1], *parts[3:]))
+        else:
+            sections[parts[0]].append(tuple(parts[i] for i in fields))
+
+    # 输出结果，每个分区用生成器一次 join
+    return "".join([
+        "Pair Coeffs\n\n",
+        "".join(f"{idx} {epsilon} {sigma}\n" for idx, (_, epsilon, sigma) in enumerate(sections["pair_coeff"], start=1)),
+        "\nBond Coeffs\n\n",
+        "".join(f"{idx} {k} {r0}\n" for idx, (_, k, r0) in enumerate(sections["bond_coeff"], start=1)),
+        "\nAngle Coeffs\n\n",
+        "".join(f"{idx} {k} {theta0}\n" for idx, (_, k, theta0) in enumerate(sections["angle_coeff"], start=1)),
+        "\nDihedral Coeffs\n\n",
+        "".join(f"{idx} " + " ".join(params) + "\n" for idx, (_, *params) in enumerate(sections["dihedral_coeff"], start=1)),
+        "\nImproper Coeffs\n\n",
+        "".join(f"{idx} {k} {phi0} {phi1}\n" for idx, (_, k, phi0, phi1) in enumerate(sections["improper_coeff"], start=1)),
+        "\n",
+    ])
+
+def remove_comments(lines):
+    """去除注释并保留空行。
 
-def remove_comments(data):
-    # 去除注释
-    return "\n".join(line.split("#")[0].strip() for line in data)
+    Args:
+        lines: 字符串或行列表。
+
+    Returns:
+        list: 去除注释后的行列表，每行以换行符结尾。
+    """
+    if isinstance(lines, str):
+        lines = lines.splitlines()
+    return [line.split('#', 1)[0].strip() + '\n' for line in lines]
 
 
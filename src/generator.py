@@ -1,10 +1,10 @@
 # generator.py
 # 该模块处理反应物 SMILES 字符串生成
-from src.molecular import MolecularModule
+from src.molecular import MolecularModule, canonical_smiles, group_queries
 from src.optimizer import init_mol_prop
 from rdkit import Chem
+import itertools
 import logging
-import os
 
 # 设置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -20,17 +20,177 @@ def are_smiles_different(smiles1, smiles2):
     Returns:
         bool: 如果两个 SMILES 代表不同的分子结构，则返回 True，否则返回 False。
     """
-    mol1 = Chem.MolFromSmiles(smiles1)
-    mol2 = Chem.MolFromSmiles(smiles2)
+    # 标准化 SMILES 按输入字符串缓存，重复比较不再重新解析
+    return canonical_smiles(smiles1) != canonical_smiles(smiles2)
 
-    if mol1 is None or mol2 is None:
-        raise ValueError("无效的 SMILES 表示法")
+def _index_after_removal(atom_idx, removed_indices):
+    """
+    计算删除若干原子后某原子的新索引。
+    
+    Args:
+        atom_idx: 原子在删除前的索引
+        removed_indices: 被删除原子的索引
+    
+    Returns:
+        int: 删除后的索引
+    """
+    return atom_idx - sum(1 for idx in removed_indices if idx < atom_idx)
+
+def _product_site_indices(link_mol, parsed_mol, n_idx, c_idx):
+    """
+    将 link_mol 中新成键的 N、C 原子索引映射到由产物 SMILES 重新解析的分子中。
+    
+    重新解析的分子中重原子按 SMILES 输出顺序编号，氢原子在加氢时追加到末尾，
+    因此 N、C 的新索引即其在输出顺序中排除氢原子后的位置。
+    
+    Args:
+        link_mol: 已调用 MolToSmiles 的产物分子对象
+        parsed_mol: 由产物 SMILES 解析的分子对象（未加氢）
+        n_idx: N 原子在 link_mol 中的索引
+        c_idx: C 原子在 link_mol 中的索引
+    
+    Returns:
+        tuple: (N 索引, C 索引)，映射无法通过校验时返回 (None, None)
+    """
+    output_order = link_mol.GetPropsAsDict(True, True).get('_smilesAtomOutputOrder')
+    if output_order is None:
+        return None, None
+    heavy_order = [idx for idx in output_order if link_mol.GetAtomWithIdx(idx).GetAtomicNum() != 1]
+    # 解析时只去除了普通氢原子，重原子数应一致
+    if len(heavy_order) != parsed_mol.GetNumAtoms() or n_idx not in heavy_order or c_idx not in heavy_order:
+        return None, None
+    n_p = heavy_order.index(n_idx)
+    c_p = heavy_order.index(c_idx)
+    if (parsed_mol.GetAtomWithIdx(n_p).GetSymbol() != 'N' or parsed_mol.GetAtomWithIdx(c_p).GetSymbol() != 'C'
+            or parsed_mol.GetBondBetweenAtoms(n_p, c_p) is None):
+        return None, None
+    return n_p, c_p
+
+def _unique_by_rank(mol, group_indices):
+    """
+    按原子对称等价类去除重复的官能团索引，每个等价类只保留第一个代表。
+    
+    Args:
+        mol: 反应物的 RDKit 分子对象
+        group_indices: 官能团索引元组列表
+    
+    Returns:
+        list: 去除对称等价后的官能团索引元组列表
+    """
+    # breakTies=False 时对称等价的原子具有相同的秩
+    ranks = list(Chem.CanonicalRankAtoms(mol, breakTies=False))
+    unique = {}
+    for group in group_indices:
+        unique.setdefault(tuple(ranks[idx] for idx in group), group)
+    return list(unique.values())
+
+
+def _one_product(base_combined, n_atoms_r1, n_index, c_index):
+    """
+    由一个胺基和一个酰氯基团生成产物分子及其 SMILES，产物原子序号留待去重后再计算。
+    
+    Args:
+        base_combined: 两个反应物合并后的分子对象
+        n_atoms_r1: 反应物1的原子数
+        n_index: 反应物1的胺基索引元组
+        c_index: 反应物2的酰氯基团索引元组
+    
+    Returns:
+        tuple: (产物 SMILES, 产物分子, 新键 N 索引, 新键 C 索引, 反应索引字典)，生成失败时返回 None
+    """
+    atom_indices_dict = {}
+    # 反应逻辑
+    # 1. 复制合并后的两个分子，RWMol 构造时会拷贝，base_combined 保持不变
+    link_mol = Chem.RWMol(base_combined)
+    # 2. 找到 N 和 C 的索引
+    n_atom_idx = n_index[0]  # N 的索引
+    c_atom_idx = n_atoms_r1 + c_index[0]  # C 原子的索引（在 link_mol 中的位置）
+    
+    # 反应前需要键合的原子，注意原子序号从 1 开始，rdkit 索引从 0 开始
+    atom_indices_dict['N_r'] = n_atom_idx + 1
+    # 注意先后顺序，制作反应模板时也是未反应含两个反应物的体系
+    atom_indices_dict['C_r'] = c_atom_idx + 1
+    
+    # 反应前标记需要删除的原子
+    atom_indices_dict['Cl_d'] = n_atoms_r1 + c_index[2] + 1
+    atom_indices_dict['H_d'] = n_index[1] + 1
+    
+    # 3. 形成酰胺键
+    link_mol.AddBond(n_atom_idx, c_atom_idx, Chem.BondType.SINGLE)
+
+    # 4. 去掉 Cl 原子和一个 N 上的 H 原子，Cl 是在 r2 基团元组中的第三个元素
+    cl_atom_idx = n_atoms_r1 + c_index[2] # Cl 原子的索引（在 link_mol 中的位置）
+    h_atom_idx = n_index[1]
+    # 批量删除：提交前索引不变，删除顺序无关，只重建一次拓扑
+    link_mol.BeginBatchEdit()
+    for atom_idx in sorted((cl_atom_idx, h_atom_idx), reverse=True):
+        link_mol.RemoveAtom(atom_idx)
+    link_mol.CommitBatchEdit()
+
+    try:
+        # 清除所有原子的原子映射号
+        for atom in link_mol.GetAtoms():
+            atom.SetAtomMapNum(0)
+        # 5. 生成新的 SMILES
+        product_smiles = Chem.MolToSmiles(link_mol, canonical=True)
+        if not product_smiles:
+            logging.error("生成产物 SMILES 失败")
+            return None
+    except Exception as e:
+        logging.error(f"处理产物时发生错误: {str(e)}")
+        return None
+    # 删除原子后新键两端原子在 link_mol 中的索引可直接推算
+    return (product_smiles, link_mol,
+            _index_after_removal(n_atom_idx, (cl_atom_idx, h_atom_idx)),
+            _index_after_removal(c_atom_idx, (cl_atom_idx, h_atom_idx)),
+            atom_indices_dict)
+
+
+def _product_indices(pattern_mol, product_smiles, link_mol, n_idx, c_idx, atom_indices_dict):
+    """
+    计算去重后产物的反应后原子序号，补充到反应索引字典中。
+    
+    Args:
+        pattern_mol: 产物中要识别的官能团分子对象
+        product_smiles: 产物 SMILES
+        link_mol: 产物分子对象
+        n_idx: 新键 N 原子在 link_mol 中的索引
+        c_idx: 新键 C 原子在 link_mol 中的索引
+        atom_indices_dict: 反应前原子序号字典，原地补充
+    
+    Returns:
+        dict: 反应索引字典，失败时返回 None
+    """
+    try:
+        # 产物模板按 SMILES 重新解析并加氢后的原子顺序编号，与 mol_from_smiles 一致，
+        # 但无需其中的立体异构枚举和 3D 构象生成
+        parsed_mol = Chem.MolFromSmiles(product_smiles)
+        if not parsed_mol:
+            logging.error(f"从 SMILES {product_smiles} 创建分子对象失败")
+            return None
 
-    # 生成标准化的 SMILES
-    canonical_smiles1 = Chem.MolToSmiles(mol1, canonical=True)
-    canonical_smiles2 = Chem.MolToSmiles(mol2, canonical=True)
+        # 按 SMILES 输出顺序将新键两端原子映射到产物中
+        n_p, c_p = _product_site_indices(link_mol, parsed_mol, n_idx, c_idx)
+        if n_p is None:
+            # 映射校验失败时退回子结构匹配
+            p_group_matches = Chem.AddHs(parsed_mol).GetSubstructMatches(pattern_mol)
+            if not p_group_matches:
+                logging.error(f"在产物 {product_smiles} 中未找到目标官能团")
+                return None
+            p_group_index = list(p_group_matches)[0]
+            n_p, c_p = p_group_index[2], p_group_index[0]
+    except Exception as e:
+        logging.error(f"处理产物时发生错误: {str(e)}")
+        return None
+    # 反应后键合的原子序号
+    atom_indices_dict['N_p'] = n_p + 1
+    atom_indices_dict['C_p'] = c_p + 1
 
-    return canonical_smiles1 != canonical_smiles2
+    # 反应后删除的原子序号，反应物均已显式加氢，link_mol 的原子数即加氢后产物的原子数
+    n_atoms_p = link_mol.GetNumAtoms()
+    atom_indices_dict['Cl_p'] = n_atoms_p + 1
+    atom_indices_dict['H_p'] = n_atoms_p + 2
+    return atom_indices_dict
 
 def generate_reaction_smile(r1, r2, g_type_smile = 'C(=O)N'):
     """
@@ -63,78 +223,37 @@ def generate_reaction_smile(r1, r2, g_type_smile = 'C(=O)N'):
     
     product_smiles_list = []
     atom_indices_dict_list = []
-    
-    # 遍历 r1 中的每个 N 原子
-    for n_index in r1_n_indices:
-        # 遍历 r2 中的每个酰氯基团
-        for c_index in r2_c_indices:
-            atom_indices_dict = {}
-            # 反应逻辑
-            # 1. 创建新分子添加两个分子
-            combined_mol = Chem.CombineMols(r1.mol, r2.mol)
-            link_mol = Chem.RWMol(combined_mol)
-            # 2. 找到 N 和 C 的索引
-            n_atom_idx = n_index[0]  # N 的索引
-            c_atom_idx = r1.mol.GetNumAtoms() + c_index[0]  # C 原子的索引（在 link_mol 中的位置）
-            
-            # 反应前需要键合的原子，注意原子序号从 1 开始，rdkit 索引从 0 开始
-            atom_indices_dict['N_r'] = n_atom_idx + 1
-            # 注意先后顺序，制作反应模板时也是未反应含两个反应物的体系
-            atom_indices_dict['C_r'] = c_atom_idx + 1
-            
-            # 反应前标记需要删除的原子
-            atom_indices_dict['Cl_d'] = r1.mol.GetNumAtoms() + c_index[2] + 1
-            atom_indices_dict['H_d'] = n_index[1] + 1
-            
-            # 3. 形成酰胺键
-            link_mol.AddBond(n_atom_idx, c_atom_idx, Chem.BondType.SINGLE)
-
-            # 4. 去掉 Cl 原子，Cl 是在 r2 基团元组中的第三个元素
-            cl_atom_idx = r1.mol.GetNumAtoms() + c_index[2] # Cl 原子的索引（在 link_mol 中的位置）
-            # 从 link_mol 中去掉 Cl
-            link_mol.RemoveAtom(cl_atom_idx)
-            
-            h_atom_idx = n_index[1]
-            # 从 link_mol 中去掉一个 N 上的 H 原子
-            link_mol.RemoveAtom(h_atom_idx)
-
-            try:
-                # 清除所有原子的原子映射号
-                for atom in link_mol.GetAtoms():
-                    atom.SetAtomMapNum(0)
-                # 5. 生成新的 SMILES
-                product_smiles = Chem.MolToSmiles(link_mol, canonical=True)
-                if not product_smiles:
-                    logging.error("生成产物 SMILES 失败")
-                    continue
-
-                product_mol = MolecularModule.mol_from_smiles(product_smiles)
-                if not product_mol:
-                    logging.error(f"从 SMILES {product_smiles} 创建分子对象失败")
-                    continue
-                
-                # 重新计算产物基团索引
-                p_group_matches = product_mol.GetSubstructMatches(Chem.MolFromSmiles(g_type_smile))
-                if not p_group_matches:
-                    logging.error(f"在产物 {product_smiles} 中未找到目标官能团")
-                    continue
-                p_group_index = list(p_group_matches)[0]
-            except Exception as e:
-                logging.error(f"处理产物时发生错误: {str(e)}")
-                continue
-            # 反应后键合的原子序号
-            atom_indices_dict['N_p'] = p_group_index[2] + 1
-            atom_indices_dict['C_p'] = p_group_index[0] + 1
+    # 已生成产物的集合，用于 O(1) 去重，列表保留生成顺序
+    seen = set()
+
+    # 循环不变量：合并后的反应物、r1 原子数和官能团匹配模板只计算一次
+    n_atoms_r1 = r1.mol.GetNumAtoms()
+    pattern_mol = group_queries(g_type_smile)[0]
+    base_combined = Chem.CombineMols(r1.mol, r2.mol)
 
-            # 反应后删除的原子序号
-            atom_indices_dict['Cl_p'] = product_mol.GetNumAtoms() + 1
-            atom_indices_dict['H_p'] = product_mol.GetNumAtoms() + 2
+    # 对称等价的胺基/酰氯基团生成相同产物，每个等价类只保留一个代表，去重仍作为兜底
+    reduced_n = _unique_by_rank(r1.mol, r1_n_indices)
+    reduced_c = _unique_by_rank(r2.mol, r2_c_indices)
 
+    # 按 (N, 酰氯) 组合依次生成产物；RWMol 编辑与 SMILES 读写持有 GIL，线程池无法并行
+    unique_results = []
+    for n_index, c_index in itertools.product(reduced_n, reduced_c):
+        result = _one_product(base_combined, n_atoms_r1, n_index, c_index)
+        if result is None:
+            continue
+        # 将产物 SMILES 添加到列表中（避免重复）
+        if result[0] in seen:
+            continue
+        seen.add(result[0])
+        unique_results.append(result)
 
-            # 将产物 SMILES 添加到列表中（避免重复）
-            if product_smiles not in product_smiles_list:
-                product_smiles_list.append(product_smiles)
-                atom_indices_dict_list.append(atom_indices_dict)
+    # 重新解析和原子序号映射只对去重后的产物进行，重复路径不再付出这部分开销
+    for result in unique_results:
+        atom_indices_dict = _product_indices(pattern_mol, *result)
+        if atom_indices_dict is None:
+            continue
+        product_smiles_list.append(result[0])
+        atom_indices_dict_list.append(atom_indices_dict)
     
     # 副产物固定为HCl
     byproduct_smiles = "[H]Cl"
@@ -142,32 +261,40 @@ def generate_reaction_smile(r1, r2, g_type_smile = 'C(=O)N'):
     return (product_smiles_list, byproduct_smiles, atom_indices_dict_list)
 
 
-def init_product_info(path_dict, r1_mol, r2_mol, is_second_reaction=False):
+def _enumerate_products(path_dict, r1_mol, r2_mol, is_second_reaction, max_depth, depth, seen_smiles, pending, parent_name=None):
     """
-    初始化产物信息，将产物的各种信息填充到path_dict中
+    枚举反应产物（含二次反应产物）并登记到 path_dict，不生成分子结构文件。
     
     Args:
         path_dict: 包含基本目录结构、反应信息的字典
         r1_mol: 第一个反应物的MolecularModule对象
         r2_mol: 第二个反应物的MolecularModule对象
-        is_second_reaction: 是否为二次反应，默认为False
+        is_second_reaction: 是否为二次反应
+        max_depth: 二次反应的最大递归深度
+        depth: 当前递归深度
+        seen_smiles: 已进行过二次反应的产物标准化 SMILES 集合
+        pending: 待初始化的 (文件名, 离子力场字典) 列表，原地追加
+        parent_name: 二次反应时作为反应物1的上一级产物文件名
         
     Returns:
         path_dict: 更新后的字典，包含产物信息
-        product_mols: 产物分子对象列表
     """
-    logging.info('初始化产物分子信息...')
-    
     # 生成反应产物SMILES
     product_smiles_list, byproduct_smile, reaction_index_dicts_list = generate_reaction_smile(r1_mol, r2_mol)
     
-    product_mols = []
+    # 记录各类分子在 file_name 中的区间 [start, stop)，下游按区间取名而不是依赖固定偏移
+    sections = path_dict.setdefault('_sections', {})
+    start = len(path_dict['file_name'])
+    if not is_second_reaction:
+        sections['reactants'] = [0, start]
+    
     # 创建产物文件名列表，格式为r1_r2_index
+    p_file_names = []
     for i in range(len(product_smiles_list)):
         # 生成当前产物的文件名
         if is_second_reaction:
-            # 二次反应产物命名格式
-            p_file_name = f"{path_dict['file_name'][0]}_{path_dict['file_name'][1]}_{i+1}_{path_dict['file_name'][1]}_2nd_{i+1}"
+            # 二次反应产物命名格式为 上一级产物_r2_2nd_index，多级反应时名称唯一
+            p_file_name = f"{parent_name}_{path_dict['file_name'][1]}_2nd_{i+1}"
         else:
             p_file_name = f"{path_dict['file_name'][0]}_{path_dict['file_name'][1]}_{i+1}"
         
@@ -179,56 +306,92 @@ def init_product_info(path_dict, r1_mol, r2_mol, is_second_reaction=False):
         
         # 更新smiles字典
         path_dict['smiles'][p_file_name] = product_smiles_list[i]
+        pending.append((p_file_name, None))
+        p_file_names.append(p_file_name)
         
+    stop = len(path_dict['file_name'])
+    if not is_second_reaction:
+        sections['products_1st'] = [start, stop]
+    elif 'products_2nd' in sections:
+        # 多级二次反应的产物依次追加，区间连续
+        sections['products_2nd'][1] = stop
+    else:
+        sections['products_2nd'] = [start, stop]
+    
     # 添加反应索引信息
     if not is_second_reaction:
         path_dict['reaction_index_dicts_list'] = reaction_index_dicts_list
-        path_dict['p_smiles_num'] = len(product_smiles_list)
     else:
         path_dict['reaction_index_dicts_list'] += reaction_index_dicts_list
-        path_dict['p_smiles_num_2nd'] = len(product_smiles_list)
     # 处理副产物相关信息，只在第一次反应时添加
     if not is_second_reaction:
         byp_file_name = 'byp'
         path_dict['file_name'].append(byp_file_name)
         path_dict['type'][byp_file_name] = 'byp'
         path_dict['smiles'][byp_file_name] = byproduct_smile
-    
-    # 实例化产物分子
-    if is_second_reaction:
-        # 二次反应只处理产物，不处理副产物
-        p_file_names = path_dict['file_name'][-len(product_smiles_list):]
-        path_dict, p_mols = init_mol_prop(path_dict, p_file_names, mol_ff = None)
-        product_mols.extend(p_mols)
-    else:
-        # 第一次反应处理产物和副产物
-        p_file_names = path_dict['file_name'][3:-1] if 'byp' in path_dict['file_name'] else path_dict['file_name'][3:]
-        byp_file_names = [path_dict['file_name'][-1]] if 'byp' in path_dict['file_name'] else []
-        path_dict, p_mols = init_mol_prop(path_dict, p_file_names, mol_ff = None)
-        if byp_file_names:
-            path_dict, byp_mols = init_mol_prop(path_dict, byp_file_names, mol_ff = {'Cl': 'Cl', 'H': 'hx'})
-            product_mols.extend(byp_mols)
-        product_mols.extend(p_mols)
-    
-    logging.info('初始化产物分子信息完成')
+        sections['byproduct'] = [stop, stop + 1]
+        pending.append((byp_file_name, {'Cl': 'Cl', 'H': 'hx'}))
     
     # 检查是否需要进行二次反应
     # 由于反应改变了N原子的原子类型，所有的键、角、二面角等信息都会改变，需要邻居原子间隔三个以上的原子类型都不会改变
     # 因此通过检查group_min_distances是否小于等于3来判断是否需要进行二次反应，添加模拟所需的额外力场参数
-    if not is_second_reaction:  # 防止无限递归
-        # 检查反应物的group_min_distances是否小于等于3
-        for i, p_mol in enumerate(p_mols):
-            # 检查group_min_distances是否小于等于3
-            if r1_mol.group_min_distances is not None and r1_mol.group_min_distances <= 3:
-                # 使用当前产物作为新的反应物，与酰氯再次反应
-                p_mol.mol_type = 'r1'
-                # 计算分子属性，重新计算反应基团
-                p_mol.cal_mol_prop()
-                path_dict, second_product_mols = init_product_info(path_dict, p_mol, r2_mol, is_second_reaction=True)
-                
-                # 将二次反应产物添加到产物列表中
-                product_mols.extend(second_product_mols)
-                break  # 只对第一个满足条件的产物进行二次反应
+    # 限制递归深度，防止多官能团单体级联反应时产物组合爆炸
+    if depth < max_depth and r1_mol.group_min_distances is not None and r1_mol.group_min_distances <= 3:
+        for p_file_name, p_smiles in zip(p_file_names, product_smiles_list):
+            # 不同 (N, C) 路径得到的相同产物只进行一次二次反应
+            p_canonical = canonical_smiles(p_smiles)
+            if p_canonical in seen_smiles:
+                continue
+            seen_smiles.add(p_canonical)
+            # 使用当前产物作为新的反应物，与酰氯再次反应
+            # 复用已构建的产物分子，仅按 r1 类型重新识别反应基团
+            r1_second = MolecularModule.get_or_create(p_smiles, 'r1')
+            # 下一级是否继续反应取决于产物中剩余氨基的距离，get_or_create 不计算分子属性
+            r1_second.group_min_distances, r1_second.group_max_distances = r1_second.calculate_distances(
+                r1_second.mol, r1_second.mol_functional_group, len(r1_second.mol_functional_group))
+            path_dict = _enumerate_products(path_dict, r1_second, r2_mol, True, max_depth, depth + 1, seen_smiles, pending, p_file_name)
+            if max_depth <= 1:
+                break  # 默认只对第一个满足条件的产物进行二次反应
+    
+    return path_dict
+
+
+def init_product_info(path_dict, r1_mol, r2_mol, max_depth=1):
+    """
+    初始化产物信息，将产物的各种信息填充到path_dict中
+    
+    Args:
+        path_dict: 包含基本目录结构、反应信息的字典
+        r1_mol: 第一个反应物的MolecularModule对象
+        r2_mol: 第二个反应物的MolecularModule对象
+        max_depth: 二次反应的最大递归深度，默认为1；大于1时对所有满足条件的产物进行二次反应
+        
+    Returns:
+        path_dict: 更新后的字典，包含产物信息
+        product_mols: 产物分子对象列表
+    """
+    logging.info('初始化产物分子信息...')
+    
+    # 第一阶段：枚举全部产物（含二次反应产物），只登记文件名和 SMILES
+    pending = []
+    path_dict = _enumerate_products(path_dict, r1_mol, r2_mol, False, max_depth, 0, set(), pending)
+    
+    # 第二阶段：按离子力场分组，每种力场配置只调用一次 init_mol_prop
+    ff_groups = []
+    for name, mol_ff in pending:
+        for ff, names in ff_groups:
+            if ff == mol_ff:
+                names.append(name)
+                break
+        else:
+            ff_groups.append((mol_ff, [name]))
+    
+    product_mols = []
+    for mol_ff, names in ff_groups:
+        path_dict, mols = init_mol_prop(path_dict, names, mol_ff = mol_ff)
+        product_mols.extend(mols)
+    
+    logging.info('初始化产物分子信息完成')
     
     return path_dict, product_mols
 
@@ -3,11 +3,98 @@
 
 import os
 import logging
-import subprocess
 import multiprocessing
+import selectors
+import subprocess
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from lammps import lammps
+except ImportError:
+    lammps = None
 
 # 设置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# LAMMPS 输出每多少行在 INFO 级别汇总一次，逐行输出为 DEBUG 级别
+LOG_SUMMARY_LINES = 1000
+
+# 运行失败时从 LAMMPS 日志文件末尾输出的行数
+LOG_TAIL_LINES = 20
+
+def _stream_output(process):
+    """
+    使用 selectors 同时读取子进程的标准输出和标准错误，标准输出逐行写入 DEBUG 日志并定期在 INFO 级别汇总
+    
+    Args:
+        process: stdout 和 stderr 均为 PIPE 的 Popen 对象
+        
+    Returns:
+        str: 标准错误的全部内容
+    """
+    stderr_chunks = []
+    pending = b''
+    line_count = 0
+    with selectors.DefaultSelector() as selector:
+        selector.register(process.stdout, selectors.EVENT_READ)
+        selector.register(process.stderr, selectors.EVENT_READ)
+        while selector.get_map():
+            for key, _ in selector.select():
+                chunk = os.read(key.fd, 65536)
+                if not chunk:
+                    selector.unregister(key.fileobj)
+                elif key.fileobj is process.stderr:
+                    stderr_chunks.append(chunk)
+                else:
+                    # 只输出完整的行，不完整的行留到下次读取
+                    *lines, pending = (pending + chunk).split(b'\n')
+                    for line in lines:
+                        line_count += 1
+                        if logger.isEnabledFor(logging.DEBUG):
+                            logger.debug(line.decode(errors='replace').rstrip())
+                        if line_count % LOG_SUMMARY_LINES == 0:
+                            logger.info(f'LAMMPS 已输出 {line_count} 行: {line.decode(errors="replace").rstrip()}')
+    if pending:
+        logger.debug(pending.decode(errors='replace').rstrip())
+    return b''.join(stderr_chunks).decode(errors='replace')
+
+def _log_tail(log_file, n=LOG_TAIL_LINES):
+    """
+    读取 LAMMPS 日志文件的最后若干行
+    
+    Args:
+        log_file: 日志文件路径
+        n: 读取的行数
+        
+    Returns:
+        str: 日志末尾内容，文件不存在时为空字符串
+    """
+    try:
+        with open(log_file, 'r', errors='replace') as file:
+            return ''.join(deque(file, maxlen=n))
+    except OSError:
+        return ''
+
+def _run_lammps_library(run_PATH, input_file, cmdargs, log_file):
+    """
+    通过 lammps Python 模块运行输入文件，屏幕输出关闭，输出写入日志文件。
+    该函数在独立的子进程中执行，见 run_lammps_simulation
+    
+    Args:
+        run_PATH: 运行目录
+        input_file: 输入文件名
+        cmdargs: 传给 LAMMPS 的命令行参数
+        log_file: LAMMPS 日志文件路径
+    """
+    # 输入文件中的相对路径以运行目录为准，子进程独占工作目录，不影响调用方
+    os.chdir(run_PATH)
+    lmp = lammps(cmdargs=cmdargs + ['-screen', 'none', '-log', log_file])
+    try:
+        lmp.file(input_file)
+    finally:
+        lmp.close()
 
 def run_lammps_simulation(path_dict, ntasks=4, use_gpu=True, ngpus=1, binsize=None, input_file=None, output_dir=None):
     """
@@ -17,7 +104,7 @@ def run_lammps_simulation(path_dict, ntasks=4, use_gpu=True, ngpus=1, binsize=No
         path_dict: 包含路径信息的字典
         ntasks: MPI进程数量
         use_gpu: 是否使用GPU加速
-        gpu_options: GPU选项，默认为"1"
+        ngpus: 每个MPI节点使用的GPU数量，默认为1
         binsize: 邻居列表bin大小，如果为None则不设置
         input_file: 输入文件的完整路径，如果为None则使用默认路径和文件名
         output_dir: 输出文件的目录路径，如果为None则使用默认路径
@@ -25,105 +112,96 @@ def run_lammps_simulation(path_dict, ntasks=4, use_gpu=True, ngpus=1, binsize=No
     Returns:
         path_dict: 更新后的路径字典，包含模拟结果信息
     """
-    logging.info('开始运行LAMMPS模拟...')
+    logger.info('开始运行LAMMPS模拟...')
     
     # 获取运行目录
     run_PATH = output_dir if output_dir is not None else path_dict['paths']['run']
     input_file = input_file if input_file is not None else path_dict['params']['xlink']['x_file_name']
-    # 构建LAMMPS命令
-    cmd = ['mpirun', '-np', str(ntasks), 'lmp_mpi']
-    
-    # 添加GPU加速选项
+    # GPU加速选项
+    accel_args = []
     if use_gpu:
-        cmd.extend(['-sf', 'gpu', '-pk', 'gpu', str(ngpus)])
+        accel_args.extend(['-sf', 'gpu', '-pk', 'gpu', str(ngpus)])
         if binsize is not None:
-            cmd.extend(['binsize', str(binsize)])
-    
-    # 添加输入文件
-    cmd.extend(['-in', input_file])
+            accel_args.extend(['binsize', str(binsize)])
+
+    # 单进程任务且可导入 lammps Python 模块时直接调用库，省去 mpirun 和 MPI 初始化开销；
+    # 库在 spawn 子进程中运行，LAMMPS 出错退出或切换工作目录都不会影响当前进程。
+    # 多进程任务（ntasks > 1）仍通过 mpirun 运行
+    if lammps is not None and ntasks == 1:
+        log_file = os.path.join(os.path.abspath(run_PATH), 'log.lammps')
+        try:
+            logger.info(f"通过 lammps Python 模块运行: {input_file}，日志: {log_file}")
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+                executor.submit(_run_lammps_library, os.path.abspath(run_PATH), input_file, accel_args, log_file).result()
+            logger.info('LAMMPS模拟成功完成')
+        except Exception as e:
+            logger.error(f"运行LAMMPS时出错: {e}\n日志末尾:\n{_log_tail(log_file)}")
+        return
+
+    # 构建LAMMPS命令
+    cmd = ['mpirun', '-np', str(ntasks), 'lmp_mpi'] + accel_args + ['-in', input_file]
 
-    
-    # 切换到运行目录
-    current_dir = os.getcwd()
-    os.chdir(run_PATH)
-    
     try:
-        # 运行LAMMPS命令
-        logging.info(f"执行命令: {' '.join(cmd)}")
-        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        # 运行LAMMPS命令，通过 cwd 指定运行目录，不再切换当前进程的工作目录
+        logger.info(f"执行命令: {' '.join(cmd)}")
+        process = subprocess.Popen(cmd, cwd=run_PATH, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
         
-        # 实时输出日志
-        while True:
-            output = process.stdout.readline()
-            if output == '' and process.poll() is not None:
-                break
-            if output:
-                logging.info(output.strip())
+        # 同时读取标准输出和标准错误，避免任一管道写满导致子进程阻塞
+        stderr = _stream_output(process)
         
         # 获取返回码
-        return_code = process.poll()
+        return_code = process.wait()
         
         # 检查是否成功
         if return_code == 0:
-            logging.info('LAMMPS模拟成功完成')
+            logger.info('LAMMPS模拟成功完成')
         else:
-            stderr = process.stderr.read()
-            logging.error(f'LAMMPS模拟失败，返回码: {return_code}\n错误信息: {stderr}')
+            logger.error(f'LAMMPS模拟失败，返回码: {return_code}\n错误信息: {stderr}')
     
     except Exception as e:
-        logging.error(f"运行LAMMPS时出错: {e}")
-    
-    finally:
-        # 恢复原始工作目录
-        os.chdir(current_dir)
+        logger.error(f"运行LAMMPS时出错: {e}")
     
     return
 
-def run_parallel_simulations(simulation_configs, max_workers=None):
+def run_parallel_simulations(simulation_configs, max_workers=None, total_gpus=None):
     """
     并行运行多个LAMMPS模拟任务
     
     Args:
         simulation_configs: 包含多个模拟配置的列表，每个配置是一个字典，包含path_dict和其他参数
-        max_workers: 最大并行任务数，默认为CPU核心数
+        max_workers: 最大并行任务数，默认为CPU核心数除以单个任务的MPI进程数
+        total_gpus: 可用GPU总数，指定时GPU任务的并行数不超过 total_gpus // ngpus
         
     Returns:
         results: 包含所有模拟结果的列表
     """
-    logging.info(f'开始并行运行{len(simulation_configs)}个LAMMPS模拟任务...')
+    logger.info(f'开始并行运行{len(simulation_configs)}个LAMMPS模拟任务...')
     
-    # 如果未指定最大并行任务数，则使用CPU核心数
+    # 每个任务自身会启动 ntasks 个 MPI 进程，按核心预算计算并行任务数，避免超额订阅
+    max_ntasks = max((config.get('ntasks', 4) for config in simulation_configs), default=1)
     if max_workers is None:
-        max_workers = multiprocessing.cpu_count()
+        max_workers = max(1, (os.cpu_count() or 1) // max_ntasks)
     
-    # 限制最大并行任务数不超过配置数量
-    max_workers = min(max_workers, len(simulation_configs))
+    # GPU 任务同时受可用 GPU 数量限制
+    if total_gpus is not None and any(config.get('use_gpu', True) for config in simulation_configs):
+        max_ngpus = max(config.get('ngpus', 1) for config in simulation_configs)
+        max_workers = min(max_workers, max(1, total_gpus // max_ngpus))
     
-    # 创建进程池
-    pool = multiprocessing.Pool(processes=max_workers)
-    
-    # 提交任务
-    results = []
-    for config in simulation_configs:
-        path_dict = config.get('path_dict')
-        ntasks = config.get('ntasks', 4)
-        use_gpu = config.get('use_gpu', True)
-        gpu_options = config.get('gpu_options', "1")
-        binsize = config.get('binsize', None)
+    # 限制最大并行任务数不超过配置数量
+    max_workers = max(1, min(max_workers, len(simulation_configs)))
+    
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        # 提交任务
+        futures = [executor.submit(run_lammps_simulation,
+                                   config.get('path_dict'),
+                                   config.get('ntasks', 4),
+                                   config.get('use_gpu', True),
+                                   config.get('ngpus', 1),
+                                   config.get('binsize', None))
+                   for config in simulation_configs]
         
-        # 异步提交任务
-        result = pool.apply_async(run_lammps_simulation, 
-                                 args=(path_dict, ntasks, use_gpu, gpu_options, binsize))
-        results.append(result)
-    
-    # 关闭进程池，不再接受新任务
-    pool.close()
-    
-    # 等待所有任务完成
-    pool.join()
-    
-    # 获取所有任务的结果
-    final_results = [result.get() for result in results]
+        # 按提交顺序获取所有任务的结果
+        final_results = [future.result() for future in futures]
     
-    logging.info('所有LAMMPS模拟任务已完成')
-    return final_results
\ No newline at end of file
+    logger.info('所有LAMMPS模拟任务已完成')
+    return final_results
@@ -2,6 +2,7 @@
 # 并行运行数据库单行反应模拟任务
 
 import logging
+import subprocess
 import concurrent.futures
 from src.database import DatabaseModule
 from src.simulator import *
@@ -117,8 +118,8 @@ def run_simulation(id, tmp_path = 'tmp/'):
     logging.info('Lammps 输入文件写入完成')
     
     # # Step 8: 运行 LAMMPS 模拟
-    os.chdir(path_dict['paths']['run'])
-    os.system('mpirun -np 2 lmp_mpi -echo screen -in in.lammps')
+    subprocess.run(['mpirun', '-np', '2', 'lmp_mpi', '-echo', 'screen', '-in', 'in.lammps'],
+                   cwd=path_dict['paths']['run'], check=False)
 
     # run_lammps_simulation("in.lammps")
 
@@ -134,16 +135,23 @@ def run_simulation(id, tmp_path = 'tmp/'):
 
 def run_parallel(db_path='data/database/reaction.db', max_workers = 3):
     """
-    使用线程池并行运行多个反应模拟任务。
+    使用进程池并行运行多个反应模拟任务。
     
     Args:
         db_path: 数据库文件路径，默认为 'data/database/reaction.db'。
-        max_workers: 最大线程数，默认为 3。
+        max_workers: 最大进程数，默认为 3。
     """
     db = DatabaseModule(db_path)
     indexs = db.get_column_list('id')
-    with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
-        executor.map(run_simulation, indexs)
+    # 模拟准备阶段的 RDKit、pysimm 计算受 GIL 限制，且各任务会修改工作目录等进程级状态，使用进程隔离
+    with concurrent.futures.ProcessPoolExecutor(max_workers) as executor:
+        futures = {executor.submit(run_simulation, i): i for i in indexs}
+        # 逐个收集结果，单个反应失败时记录异常而不是静默丢弃
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                future.result()
+            except Exception:
+                logging.exception(f"反应 {futures[future]} 模拟失败")
 
 
 if __name__ == "__main__":
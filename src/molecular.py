@@ -2,17 +2,100 @@
 # 小分子对象与自定义分子指纹生成
 
 from rdkit import Chem
-from rdkit.Chem import Draw
-from rdkit.Chem.Draw import IPythonConsole
-from rdkit.Chem import rdmolops, Descriptors
-from rdkit.Chem import AllChem
+from rdkit.Chem.rdchem import BondStereo, HybridizationType
 import numpy as np
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import copy
+import functools
 import logging
+import multiprocessing
+import os
 
 # 设置日志配置
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 
+@functools.lru_cache(maxsize=4096)
+def canonical_smiles(smiles):
+    """
+    计算 SMILES 的标准化形式，以输入字符串为键缓存结果。
+    
+    Args:
+        smiles: 分子的 SMILES 表示法
+    
+    Returns:
+        str: 标准化的 SMILES
+    """
+    mol = Chem.MolFromSmiles(smiles)
+    if mol is None:
+        raise ValueError("无效的 SMILES 表示法")
+    return Chem.MolToSmiles(mol, canonical=True)
+
+
+# 各基团 SMILES 对应的预编译 SMARTS 查询，分子均已显式加氢，匹配元组依次为 (中心原子, 相连原子...)
+# N: NH2 与 NH 两种情况，元组为 (N, H[, H])；C: 甲基，元组为 (C, H, H, H)
+_GROUP_QUERIES = {
+    "N": tuple(Chem.MolFromSmarts(q) for q in ("[#7;H2]([#1])[#1]", "[#7;H1][#1]")),
+    "C(=O)Cl": (Chem.MolFromSmarts("C(=O)Cl"),),
+    "C": (Chem.MolFromSmarts("[#6;H3]([#1])([#1])[#1]"),),
+    "C(=O)N": (Chem.MolFromSmarts("C(=O)N"),),
+    "Cl": (Chem.MolFromSmarts("[Cl]"),),
+}
+
+
+# 分子指纹每个特征 4 个比特位的位移表，高位在前
+_FINGERPRINT_SHIFTS = np.array([3, 2, 1, 0], dtype=np.int64)
+
+
+@functools.lru_cache(maxsize=64)
+def group_queries(group_smiles):
+    """
+    获取基团的子结构查询分子，优先使用预编译的 SMARTS，其余基团按 SMILES 解析一次后缓存。
+    
+    Args:
+        group_smiles: 基团的 SMILES 表示法
+    
+    Returns:
+        tuple: 查询分子元组
+    """
+    queries = _GROUP_QUERIES.get(group_smiles)
+    if queries is None:
+        group_mol = Chem.MolFromSmiles(group_smiles)
+        if not group_mol:
+            logging.error(f"无效的基团 SMILES 表示法")
+            raise ValueError(f"无效的基团 SMILES 表示法: {group_smiles}")
+        queries = (group_mol,)
+    return queries
+
+
+def _cache_get(cache, key):
+    """从 LRU 缓存中读取，命中时移到末尾。"""
+    value = cache.get(key)
+    if value is not None:
+        cache.move_to_end(key)
+    return value
+
+def _cache_put(cache, key, value, maxsize):
+    """写入 LRU 缓存，超出容量时淘汰最久未使用的条目。"""
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > maxsize:
+        cache.popitem(last=False)
+
+
+# (SMILES, 构建参数) 到 3D 分子对象的缓存，见 MolecularModule.mol_from_smiles；
+# 以原始 SMILES 而非标准化 SMILES 为键，保证原子顺序与输入字符串一致，按 LRU 限制容量
+_EMBED_CACHE_SIZE = 512
+_EMBED_CACHE = OrderedDict()
+
+
+# SMILES 到已构建分子对象的缓存，见 MolecularModule.get_or_create；
+# 遍历整个数据库时分子数量很多，按 LRU 限制容量
+_MOL_CACHE_SIZE = 512
+_MOL_CACHE = OrderedDict()
+
+
 class MolecularModule:
     def __init__(self, smiles : str, g_type : str):
         """
@@ -28,7 +111,8 @@ class MolecularModule:
         """
         self.smiles = smiles
         self.mol_type = g_type
-        self.mol = self.mol_from_smiles(smiles)
+        # 同时保留不含 H 的分子，输出图片时无需再次解析 SMILES
+        self.mol, self.simple_mol = self.mol_from_smiles(smiles, return_simple=True)
 
         self.group_smiles = self.get_functional_group(self.mol_type)
         self.mol_functional_group = self.functional_group_index(self.mol, self.group_smiles)
@@ -44,14 +128,91 @@ class MolecularModule:
     def cal_mol_prop(self):
         self.group_smiles = self.get_functional_group(self.mol_type)
         self.mol_functional_group = self.functional_group_index(self.mol, self.group_smiles)
-        self.rings = self.count_rings(self.mol)
+        # 环识别和拓扑距离矩阵只计算一次，供各属性共用
+        sssr = Chem.GetSSSR(self.mol)
+        dm = Chem.GetDistanceMatrix(self.mol)
+        self.rings = self.count_rings(self.mol, sssr)
         self.count_group = len(self.mol_functional_group)
-        self.group_min_distances, self.group_max_distances = self.calculate_distances(self.mol, self.mol_functional_group, self.count_group)
+        self.group_min_distances, self.group_max_distances = self.calculate_distances(self.mol, self.mol_functional_group, self.count_group, dm)
         self.ar_sp3_balance = self.calculate_ar_sp3_balance(self.mol)
         self.aromatic_rings = self.count_aromatic_rings(self.mol)
         # 生成分子指纹
         self.molfinger = self.generate_bit_fingerprint(self.rings, self.count_group, self.group_min_distances, self.group_max_distances, self.aromatic_rings)
 
+    @classmethod
+    def get_or_create(cls, smiles, mol_type):
+        """
+        从缓存获取分子对象，不存在时构建并缓存，避免重复的 3D 构象生成。
+        
+        以输入的 SMILES 字符串为键而非标准化 SMILES，保证原子顺序与该字符串一致，
+        反应模板的原子索引依赖这一顺序。
+        
+        Args:
+            smiles: 分子的 SMILES 表示法
+            mol_type: 分子类型
+        
+        Returns:
+            MolecularModule: 缓存对象的拷贝，RDKit 分子对象为独立副本，分子类型为 mol_type
+        """
+        cached = _cache_get(_MOL_CACHE, smiles)
+        if cached is None:
+            cached = cls(smiles, mol_type)
+            _cache_put(_MOL_CACHE, smiles, cached, _MOL_CACHE_SIZE)
+        return cls._as_type(cached, mol_type)
+
+    @staticmethod
+    def _as_type(cached, mol_type):
+        """返回缓存对象的拷贝，分子类型不同时重新识别官能团。"""
+        mol = copy.copy(cached)
+        # RDKit 分子对象单独复制，下游修改（如 rkmol_print 设置原子映射号）不会污染缓存
+        mol.mol = Chem.Mol(cached.mol)
+        if cached.simple_mol is not None:
+            mol.simple_mol = Chem.Mol(cached.simple_mol)
+        if mol.mol_type != mol_type:
+            # 分子类型变化时只需重新识别官能团
+            mol.mol_type = mol_type
+            mol.group_smiles = mol.get_functional_group(mol_type)
+            mol.mol_functional_group = mol.functional_group_index(mol.mol, mol.group_smiles)
+        return mol
+
+    @classmethod
+    def get_or_create_many(cls, items):
+        """
+        批量获取分子对象，未缓存的分子在进程池中并行构建（加氢、立体异构枚举与 3D 构象生成）。
+        
+        Args:
+            items: (SMILES, 分子类型) 元组列表
+        
+        Returns:
+            list: 与 items 顺序一致的 MolecularModule 对象列表
+        """
+        # 已缓存的对象先取出，后续写入缓存时即使被淘汰也不会重新构建
+        built = {}
+        missing = {}
+        for smiles, mol_type in items:
+            if smiles in built or smiles in missing:
+                continue
+            cached = _cache_get(_MOL_CACHE, smiles)
+            if cached is not None:
+                built[smiles] = cached
+            else:
+                missing[smiles] = mol_type
+        if len(missing) > 1:
+            # RDKit 在 fork 出的子进程中不安全，使用 spawn 启动
+            with ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, len(missing)),
+                                     mp_context=multiprocessing.get_context('spawn')) as executor:
+                for smiles, mol in zip(missing, executor.map(cls, missing.keys(), missing.values())):
+                    built[smiles] = mol
+                    _cache_put(_MOL_CACHE, smiles, mol, _MOL_CACHE_SIZE)
+        # 只有一个未缓存的分子时由 get_or_create 在本进程中构建
+        return [cls._as_type(built[smiles], mol_type) if smiles in built else cls.get_or_create(smiles, mol_type)
+                for smiles, mol_type in items]
+
+    @functools.cached_property
+    def canonical_smiles(self):
+        """分子的标准化 SMILES，首次访问时计算。"""
+        return canonical_smiles(self.smiles)
+
     @staticmethod
     def get_functional_group(mol_type):
         """
@@ -87,69 +248,56 @@ class MolecularModule:
         Returns:
             基团索引列表
         """
-        group_mol = Chem.MolFromSmiles(group_smiles)
-        if not group_mol:
-            logging.error(f"无效的基团 SMILES 表示法")
-            raise
+        queries = group_queries(group_smiles)
 
         indices = []
-        # 处理 CH3 的特殊情况
-        if group_smiles == "C":
-            for atom in mol.GetAtoms():
-                if atom.GetAtomicNum() == 6:  # 碳原子
-                    index_tuple = (atom.GetIdx(),)
-                    hydrogen_count = 0
-                    for neighbor in atom.GetNeighbors():
-                        if neighbor.GetAtomicNum() == 1:  # 氢原子
-                            hydrogen_count += 1
-                            index_tuple += (neighbor.GetIdx(),)
-                    if hydrogen_count == 3:
-                        indices.append(index_tuple)
-
-        # 处理 NH 和 NH2 的情况
-        elif group_smiles == "N":
-            for atom in mol.GetAtoms():
-                if atom.GetAtomicNum() == 7:  # 氮原子
-                    index_tuple = (atom.GetIdx(),)
-                    hydrogen_count = 0
-                    for neighbor in atom.GetNeighbors():
-                        if neighbor.GetAtomicNum() == 1:  # 氢原子
-                            hydrogen_count += 1
-                            index_tuple += (neighbor.GetIdx(),)
-                    if hydrogen_count in (1, 2):
-                        indices.append(index_tuple)
-        else:
-            indices = mol.GetSubstructMatches(group_mol)
-            indices = list(indices)
+        # 限制匹配数量，避免高对称分子上子结构搜索的组合爆炸；每个中心原子只保留一个匹配
+        seen = set()
+        for query in queries:
+            for group in mol.GetSubstructMatches(query, uniquify=True, useChirality=False, maxMatches=256):
+                if group[0] not in seen:
+                    seen.add(group[0])
+                    indices.append(group)
+        if len(queries) > 1:
+            # 多个查询的结果按中心原子索引排序，与逐原子遍历的顺序一致
+            indices.sort(key=lambda group: group[0])
 
         return indices
     
     @staticmethod
-    def calculate_distances(rkmol, mol_functional_group, count_group):
+    def calculate_distances(rkmol, mol_functional_group, count_group, dm=None):
         """
         计算分子中指定基团之间的最小和最大距离。
+        
+        Args:
+            dm: 预先计算的拓扑距离矩阵，默认为None时现场计算
 
         Returns:
             最小距离和最大距离
         """
         if count_group < 2:
             return -1, -1
-        distances = []
-        for i in range(count_group):
-            for j in range(i + 1, count_group):
-                shortest_path = rdmolops.GetShortestPath(rkmol, mol_functional_group[i][0], mol_functional_group[j][0])
-                distances.append(len(shortest_path) - 1)
-        return min(distances), max(distances)
+        # 一次性计算拓扑距离矩阵（RDKit 会缓存在分子上），按基团首原子索引取上三角
+        if dm is None:
+            dm = Chem.GetDistanceMatrix(rkmol)
+        anchors = np.fromiter((group[0] for group in mol_functional_group), dtype=np.intp, count=count_group)
+        distances = dm[np.ix_(anchors, anchors)][np.triu_indices(count_group, k=1)]
+        return int(distances.min()), int(distances.max())
 
     @staticmethod
-    def count_rings(rkmol):
+    def count_rings(rkmol, sssr=None):
         """
         计算分子中的环的数量。
         
+        Args:
+            sssr: 预先计算的最小环集合，默认为None时现场计算
+        
         Returns:
             环的数量
         """
-        return len(Chem.GetSSSR(rkmol))
+        if sssr is None:
+            sssr = Chem.GetSSSR(rkmol)
+        return len(sssr)
     
     
     @staticmethod
@@ -160,8 +308,14 @@ class MolecularModule:
         Returns:
             ar / (sp3 + ar) 比值
         """
-        num_aromatic_carbon = len(rkmol.GetAromaticAtoms())
-        num_sp3_carbon = sum(1 for atom in rkmol.GetAtoms() if str(atom.GetHybridization()) == 'SP3' and atom.GetSymbol() == 'C')
+        # 单次遍历同时统计，芳香原子不会是 sp3 杂化，使用枚举和原子序数比较而非字符串
+        num_aromatic_carbon = 0
+        num_sp3_carbon = 0
+        for atom in rkmol.GetAtoms():
+            if atom.GetIsAromatic():
+                num_aromatic_carbon += 1
+            elif atom.GetAtomicNum() == 6 and atom.GetHybridization() == HybridizationType.SP3:
+                num_sp3_carbon += 1
         if (num_sp3_carbon + num_aromatic_carbon) != 0:
             balance = num_aromatic_carbon / (num_sp3_carbon + num_aromatic_carbon)
         else:
@@ -176,7 +330,10 @@ class MolecularModule:
         Returns:
             芳香环的数量
         """
-        return Descriptors.NumAromaticRings(rkmol)
+        # 与 Descriptors.NumAromaticRings 相同，统计分子已有环信息中所有键均为芳香键的环，
+        # 芳香键标记只遍历一次，不再经过描述符模块重新取环
+        aromatic_bonds = [bond.GetIsAromatic() for bond in rkmol.GetBonds()]
+        return sum(1 for ring in rkmol.GetRingInfo().BondRings() if all(aromatic_bonds[idx] for idx in ring))
 
     @staticmethod
     def generate_bit_fingerprint(rings, count_group, group_min_distances, group_max_distances, aromatic_rings):
@@ -193,33 +350,18 @@ class MolecularModule:
         Returns:
             指纹数组
         """
-        # 初始化比特位数组
-        fingerprint = [0] * 20  # 5个特征，每个特征4个比特位
-
-        # 设置特征值
-        features = {
-            'num_rings': rings,                           # 环的数量
-            'num_functional_groups': count_group,         # 基团数量
-            'min_distance': group_min_distances,          # 基团最小距离
-            'max_distance': group_max_distances,          # 基团最大距离
-            'num_aromatic_rings': aromatic_rings          # 芳香环的数量
-        }
-
-        # 将特征值转换为比特位
-        for i, (key, value) in enumerate(features.items()):
-            # 确保每个特征值小于16，超出范围则设为15
-            if value >= 16:
-                value = 15
-            
-            # 将值转换为4位二进制
-            for j in range(4):
-                fingerprint[i * 4 + j] = (value >> (3 - j)) & 1  # 取出相应的比特位
+        # 5个特征，每个特征4个比特位：环的数量、基团数量、基团最小距离、基团最大距离、芳香环的数量
+        values = np.array([rings, count_group, group_min_distances, group_max_distances, aromatic_rings], dtype=np.int64)
+        # 确保每个特征值小于16，超出范围则设为15
+        values[values >= 16] = 15
+        # 按位移表一次性取出每个特征的4位二进制（高位在前）
+        fingerprint = ((values[:, None] >> _FINGERPRINT_SHIFTS) & 1).ravel()
 
-        return fingerprint
+        return fingerprint.tolist()
 
 
     @staticmethod
-    def rkmol_print(mol, smiles, filepath='./r1'):
+    def rkmol_print(mol, smiles, filepath='./r1', simple_mol=None):
         """
         根据 SMLIES 字符串生成分子的 PDB 文件、PNG 图片和 MOL 文件。
         注意 rdkit 产生的对象不包含 H 原子，并且没有初始XYZ坐标
@@ -229,10 +371,16 @@ class MolecularModule:
             mol: RDKit分子对象
             smiles: 分子的 SMILES 表示法
             filepath: 分子的保存路径，包含文件名但不包含后缀
+            simple_mol: 不含 H 的 RDKit 分子对象，默认为None时由 SMILES 解析
         """
+        # 绘图模块会引入 matplotlib、PIL 和 IPython，仅在输出图片时导入
+        from rdkit.Chem import Draw
+        from rdkit.Chem.Draw import IPythonConsole
+
         # 不含 H 的图片输出
-        simlpe_mol = Chem.MolFromSmiles(smiles)
-        Draw.MolToFile(simlpe_mol, filepath + ".png")
+        if simple_mol is None:
+            simple_mol = Chem.MolFromSmiles(smiles)
+        Draw.MolToFile(simple_mol, filepath + ".png")
         
         # 生成图片保存成文件，添加索引编号
         IPythonConsole.ipython_useSVG = True
@@ -252,7 +400,7 @@ class MolecularModule:
             file.write(mol_block)
 
     @staticmethod
-    def mol_from_smiles(smiles, coord=True, version=2, ez='E', chiral='S'):
+    def mol_from_smiles(smiles, coord=True, version=2, ez='E', chiral='S', return_simple=False):
         """从SMILES字符串生成RDKit分子对象。该方法源于包：radonpy.core.utils，作者：yhayashi1986/Yoshihiro Hayashi
 
         Args:
@@ -261,10 +409,34 @@ class MolecularModule:
             version (int): ETKDG算法的版本，默认为2。
             ez (str): 控制双键的立体化学，'E'表示优先级高的取代基在双键的对面，'Z'表示在同侧。
             chiral (str): 控制手性中心的配置，'S'表示S配置，'R'表示R配置。
+            return_simple (bool): 是否同时返回加氢前的分子对象，默认为False。
 
         Returns:
             Chem.Mol: 生成的RDKit分子对象，如果转换失败则返回None。
+            return_simple 为True时返回 (分子对象, 加氢前的分子对象) 元组，失败时为 (None, None)。
+        """
+        key = (smiles, coord, version, ez, chiral)
+        cached = _cache_get(_EMBED_CACHE, key)
+        if cached is None:
+            cached = MolecularModule._embed_from_smiles(smiles, coord, version, ez, chiral)
+            # 构象嵌入带有随机性，失败的结果不缓存，下次调用时重试
+            if cached[0] is not None:
+                _cache_put(_EMBED_CACHE, key, cached, _EMBED_CACHE_SIZE)
+        # 返回副本，避免下游修改（如 rkmol_print 设置原子属性）污染缓存
+        mol, simple_mol = (Chem.Mol(m) if m is not None else None for m in cached)
+        if return_simple:
+            return mol, simple_mol
+        return mol
+
+    @staticmethod
+    def _embed_from_smiles(smiles, coord, version, ez, chiral):
+        """mol_from_smiles 的实际构建过程，不经过缓存。
+
+        Returns:
+            tuple: (分子对象, 加氢前的分子对象)，失败时为 (None, None)。
         """
+        # 延迟导入，仅构建分子的进程（包括 spawn 启动的工作进程）才需要加载
+        from rdkit.Chem import AllChem
         
         # 统计连接原子的数量
         n_conn = smiles.count('[*]') + smiles.count('*') + smiles.count('[3H]')
@@ -284,12 +456,16 @@ class MolecularModule:
         etkdg.maxAttempts = 100
 
         # 从SMILES转换为RDKit分子对象
+        failed = (None, None)
         try:
-            mol = Chem.MolFromSmiles(smi)
-            mol = Chem.AddHs(mol)  # 添加氢原子
+            simple_mol = Chem.MolFromSmiles(smi)
+            mol = Chem.AddHs(simple_mol)  # 添加氢原子
         except Exception as e:
             logging.error(f'无法从 {smiles} 转换为 RDKit 分子对象 : {e}')
-            return None
+            return failed
+        if smi != smiles:
+            # 含连接原子时图片使用原始 SMILES
+            simple_mol = Chem.MolFromSmiles(smiles)
 
         # 指定立体化学
         Chem.AssignStereochemistry(mol)
@@ -310,21 +486,23 @@ class MolecularModule:
                 bond = mol.GetBondBetweenAtoms(backbone_atoms[i], backbone_atoms[i + 1])
                 backbone_bonds.append(bond.GetIdx())
                 # 检查双键的立体化学
-                if bond.GetBondTypeAsDouble() == 2 and str(bond.GetStereo()) == 'STEREONONE' and not bond.IsInRing():
+                if bond.GetBondTypeAsDouble() == 2 and bond.GetStereo() == BondStereo.STEREONONE and not bond.IsInRing():
                     backbone_dih.append((backbone_atoms[i - 1], backbone_atoms[i], backbone_atoms[i + 1], backbone_atoms[i + 2]))
 
-        # 列出未指定立体化学的双键（不包括聚合物主链的键和环结构中的键）
-        db_list = []
-        for bond in mol.GetBonds():
-            if bond.GetBondTypeAsDouble() == 2 and str(bond.GetStereo()) == 'STEREONONE' and not bond.IsInRing():
-                if n_conn == 2 and bond.GetIdx() in backbone_bonds:
-                    continue
-                else:
-                    db_list.append(bond.GetIdx())
-
-        # 枚举立体异构体
-        opts = Chem.EnumerateStereoisomers.StereoEnumerationOptions(unique=True, tryEmbedding=True)
-        isomers = tuple(Chem.EnumerateStereoisomers.EnumerateStereoisomers(mol, options=opts))
+        # 列出未指定立体化学的双键（不包括聚合物主链的键和环结构中的键），主链键用集合做 O(1) 排除
+        backbone_bonds_set = set(backbone_bonds)
+        db_list = [
+            bond.GetIdx() for bond in mol.GetBonds()
+            if bond.GetBondTypeAsDouble() == 2 and bond.GetStereo() == BondStereo.STEREONONE and not bond.IsInRing()
+            and bond.GetIdx() not in backbone_bonds_set
+        ]
+
+        # 枚举立体异构体，立体化学已完全指定时无需枚举（枚举时每个候选都要尝试嵌入）
+        if any(si.specified == Chem.StereoSpecified.Unspecified for si in Chem.FindPotentialStereo(mol)):
+            opts = Chem.EnumerateStereoisomers.StereoEnumerationOptions(unique=True, tryEmbedding=True)
+            isomers = tuple(Chem.EnumerateStereoisomers.EnumerateStereoisomers(mol, options=opts))
+        else:
+            isomers = (mol,)
 
         if len(isomers) > 1:
             # logging.info('%i 个立体异构体候选已生成', len(isomers))
@@ -339,12 +517,12 @@ class MolecularModule:
                 # 控制未指定双键的立体化学
                 ez_list = []
                 for idx in db_list:
-                    bond = isomer.GetBondWithIdx(idx)
-                    if str(bond.GetStereo()) == 'STEREOANY' or str(bond.GetStereo()) == 'STEREONONE':
+                    stereo = isomer.GetBondWithIdx(idx).GetStereo()
+                    if stereo in (BondStereo.STEREOANY, BondStereo.STEREONONE):
                         continue
-                    elif ez == 'E' and (str(bond.GetStereo()) == 'STEREOE' or str(bond.GetStereo()) == 'STEREOTRANS'):
+                    elif ez == 'E' and stereo in (BondStereo.STEREOE, BondStereo.STEREOTRANS):
                         ez_list.append(True)
-                    elif ez == 'Z' and (str(bond.GetStereo()) == 'STEREOZ' or str(bond.GetStereo()) == 'STEREOCIS'):
+                    elif ez == 'Z' and stereo in (BondStereo.STEREOZ, BondStereo.STEREOCIS):
                         ez_list.append(True)
                     else:
                         ez_list.append(False)
@@ -381,13 +559,13 @@ class MolecularModule:
                 enbed_res = AllChem.EmbedMolecule(mol, etkdg)
             except Exception as e:
                 logging.error(f'无法生成 %s 的3D坐标：{e}', smiles)
-                return None
+                return failed
             if enbed_res == -1:
                 etkdg.useRandomCoords = True
                 enbed_res = AllChem.EmbedMolecule(mol, etkdg)
                 if enbed_res == -1:
                     logging.error(f'无法生成 %s 的3D坐标：{e}', smiles)
-                    return None
+                    return failed
 
         # 将聚合物主链中未指定双键的二面角修改为180度
         if len(backbone_dih) > 0:
@@ -400,7 +578,7 @@ class MolecularModule:
                         break
                 Chem.rdMolTransforms.SetDihedralDeg(mol.GetConformer(0), dih_idx[0], dih_idx[1], dih_idx[2], na_idx, 0.0)
 
-        return mol
+        return mol, simple_mol
 
 
 if __name__ == "__main__":
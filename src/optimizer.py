@@ -2,13 +2,29 @@
 # 该模块用于优化小分子结构并输出结果，以及初始化分子属性
 
 import os
+import functools
 import logging
+import tempfile
 from src.molecular import MolecularModule
-from src.execute import exec_ltemplify
+from src.execute import exec_ltemplify_list
 from pysimm import system, forcefield, lmps
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+@functools.lru_cache(maxsize=32)
+def _dir_basenames(directory, mtime_ns):
+    """列出目录中所有条目的不带后缀的名称，以目录修改时间为键缓存，目录内容变化后自动失效。
+    
+    Args:
+        directory: 目录路径。
+        mtime_ns: 目录的修改时间（纳秒）。
+    
+    Returns:
+        frozenset: 不带后缀的文件名集合。
+    """
+    with os.scandir(directory) as entries:
+        return frozenset(os.path.splitext(entry.name)[0] for entry in entries)
+
 def is_contains_file(directory, filename):
     """检查指定目录中是否包含给定文件名（忽略后缀）。
     
@@ -19,15 +35,9 @@ def is_contains_file(directory, filename):
     Returns:
         如果目录中存在该文件名，则返回 True，否则返回 False。
     """
-    # 获取不带后缀的文件名
+    # 获取不带后缀的文件名，在缓存的目录列表中查找
     name_without_extension = os.path.splitext(filename)[0]
-    # 列出目录中的所有文件和目录
-    for item in os.listdir(directory):
-        current_name_without_extension = os.path.splitext(item)[0]
-        # 如果找到指定的文件名，返回 True
-        if current_name_without_extension == name_without_extension:
-            return True
-    return False
+    return name_without_extension in _dir_basenames(directory, os.stat(directory).st_mtime_ns)
 
 def apply_forcefield_and_optimize(mol_path, file_name, data_out, ff_dict=None):
     """分子应用GAFF2力场并优化分子结构，支持普通分子和含力场指认的离子化合物。
@@ -38,12 +48,11 @@ def apply_forcefield_and_optimize(mol_path, file_name, data_out, ff_dict=None):
         data_out: 输出数据的路径。
         ff_dict: 离子的力场字典。
     """
-    pwd = os.getcwd()
-    mol_file = f'{file_name}.mol'
-    data_file = f'{data_out}{file_name}.data'
+    mol_file = os.path.join(mol_path, f'{file_name}.mol')
+    data_file = os.path.abspath(os.path.join(data_out, f'{file_name}.data'))
     
     try:
-        os.chdir(mol_path)
+        # 读写均使用绝对路径，无需切换工作目录
         mol_system = system.read_mol(mol_file)
         
         if ff_dict:
@@ -59,15 +68,20 @@ def apply_forcefield_and_optimize(mol_path, file_name, data_out, ff_dict=None):
         else:
             # 处理普通分子
             mol_system.apply_forcefield(f=forcefield.Gaff2(), charges="gasteiger")
-            lmps.quick_min(mol_system, np=1, min_style='cg', name='min_cg')
+            # quick_min 会在当前目录写入临时输入和日志文件，仅在这一步切换到独立的临时目录
+            pwd = os.getcwd()
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                os.chdir(tmp_dir)
+                try:
+                    lmps.quick_min(mol_system, np=1, min_style='cg', name='min_cg')
+                finally:
+                    os.chdir(pwd)
             logging.info("优化分子结构成功")
             
         mol_system.write_lammps(data_file)
     except Exception as e:
         logging.error(f"{'指认离子力场' if ff_dict else '优化分子结构'}时出错: {e}")
         raise
-    finally:
-        os.chdir(pwd)
 
 def create_molecule_file(file_name, g_type, obj_mol, mol_path, data_out, mol_ff=None):
     """处理单类分子：生成结构文件并应用力场。
@@ -83,7 +97,7 @@ def create_molecule_file(file_name, g_type, obj_mol, mol_path, data_out, mol_ff=
     # 处理所有类型分子
     if file_name and not is_contains_file(mol_path, file_name):
         logging.info(f'检测到新的{g_type}分子')
-        obj_mol.rkmol_print(obj_mol.mol, obj_mol.smiles, f'{mol_path}{file_name}')
+        obj_mol.rkmol_print(obj_mol.mol, obj_mol.smiles, f'{mol_path}{file_name}', obj_mol.simple_mol)
         apply_forcefield_and_optimize(mol_path, file_name, data_out, mol_ff)
         logging.info(f"已添加{g_type}分子 DATA 文件至相应目录")
 
@@ -102,18 +116,18 @@ def init_mol_prop(path_dict, file_names, mol_ff = None):
     """
     logging.info('实例化反应物分子...')
 
-    # 通过 SMILES 实例化反应物 MolecularModule 类
-    mols = []
-    for name in file_names:
-        mol = MolecularModule(path_dict['smiles'][name], path_dict['type'][name])
+    # 通过 SMILES 实例化反应物 MolecularModule 类，各分子的 3D 构象在进程池中并行生成
+    mols = MolecularModule.get_or_create_many([(path_dict['smiles'][name], path_dict['type'][name]) for name in file_names])
+    # 文件读写和力场指认仍在主进程中逐个进行，避免切换工作目录的竞争
+    for name, mol in zip(file_names, mols):
         # 仅对反应物和溶剂分子计算属性
         if path_dict['type'][name] in ['r1', 'r2', 'sol']:
             # 显式调用计算分子属性
             mol.cal_mol_prop()
         # 优化生成分子结构
         create_molecule_file(name, path_dict['type'][name], mol, path_dict['paths']['mol'], path_dict['paths']['data'], mol_ff)
-        exec_ltemplify(path_dict['paths']['data'], path_dict['paths']['lt'], name)
-        mols.append(mol)
+    # 并行生成所有分子的 LT 模板文件
+    exec_ltemplify_list(path_dict['paths']['data'], path_dict['paths']['lt'], file_names)
     logging.info('实例化反应物分子完成')
     
     # 将分子性质添加到 path_dict 中
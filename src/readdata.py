@@ -2,6 +2,110 @@
 # 该模块用于读取 LAMMPS 数据文件
 
 import re
+import functools
+import numpy as np
+
+# 注释匹配 - 保留质量标签中的注释，例如 # C_3
+_COMMENT_RE = re.compile(r'(?<!\d\s\s)#.*')
+
+# 读取 LAMMPS 数据文件的缓冲区大小
+_READ_BUFFER = 1 << 20
+
+# 头部关键词到 sys_info 键的映射，按行尾两个词查表
+_HEADER_COUNTS = {
+    'atom types': 'atom_types',
+    'bond types': 'bond_types',
+    'angle types': 'angle_types',
+    'dihedral types': 'dihedral_types',
+    'improper types': 'improper_types',
+}
+_HEADER_BOX = {
+    'xlo xhi': 'xlo_xhi',
+    'ylo yhi': 'ylo_yhi',
+    'zlo zhi': 'zlo_zhi',
+}
+
+# GAFF2 力场所有元素的参考质量与元素符号
+_REF_MASSES = np.array([12.01, 1.008, 35.45, 14.01, 16.00, 19.00, 79.90, 126.9, 30.97, 32.06])
+_REF_ELEMENTS = np.array(['C', 'H', 'Cl', 'N', 'O', 'F', 'Br', 'I', 'P', 'S'])
+# 质量匹配容差，远小于相邻参考质量的间隔
+_MASS_TOL = 0.2
+# 质量乘 100 取整后到元素符号的映射，整数键不受 12.0100 与 12.01 等写法差异影响
+_ELEM_BY_MASS = {int(round(m * 100)): e for m, e in zip(_REF_MASSES.tolist(), _REF_ELEMENTS.tolist())}
+
+def _map_masses_kernel(masses, refs, tol):
+    """
+    逐个查找每个质量在容差内对应的参考质量索引，未匹配时为 -1。
+
+    Args:
+        masses (np.ndarray): 原子类型质量数组。
+        refs (np.ndarray): 参考质量数组。
+        tol (float): 匹配容差。
+
+    Returns:
+        np.ndarray: 参考质量索引数组。
+    """
+    out = np.full(masses.shape[0], -1, np.int64)
+    for i in range(masses.shape[0]):
+        for j in range(refs.shape[0]):
+            if abs(masses[i] - refs[j]) < tol:
+                out[i] = j
+                break
+    return out
+
+def _map_masses_numpy(masses, refs, tol):
+    """
+    _map_masses_kernel 的 NumPy 向量化实现，未安装 numba 时使用。
+    """
+    diff = np.abs(masses[:, None] - refs[None, :])
+    hit = diff.argmin(axis=1)
+    return np.where(diff[np.arange(len(masses)), hit] < tol, hit, -1)
+
+# 原子类型数不少于该值时才尝试使用 numba 编译的质量映射
+_NUMBA_MIN_TYPES = 256
+
+@functools.lru_cache(maxsize=None)
+def _numba_kernel():
+    """
+    延迟导入 numba 并编译 _map_masses_kernel，导入与编译开销只在首次需要时付出。
+
+    Returns:
+        callable: 编译后的质量映射函数，未安装 numba 时为 None。
+    """
+    try:
+        import numba
+    except ImportError:
+        return None
+    return numba.njit(cache=True)(_map_masses_kernel)
+
+def _map_masses(masses, refs, tol):
+    """
+    查找每个质量在容差内对应的参考质量索引，未匹配时为 -1。
+    原子类型较多且安装 numba 时使用编译后的实现，否则使用 NumPy 实现。
+    """
+    if masses.shape[0] >= _NUMBA_MIN_TYPES:
+        kernel = _numba_kernel()
+        if kernel is not None:
+            return kernel(masses, refs, tol)
+    return _map_masses_numpy(masses, refs, tol)
+
+def iter_clean(lines):
+    """
+    逐行清理数据的生成器：移除注释、换行符和尾部空白字符，并丢弃由此产生的空行。
+
+    Args:
+        lines (iterable of str): 原始行数据，可以是打开的文件对象。
+
+    Yields:
+        str: 清理后的非空行。
+    """
+    for line in lines:
+        # 绝大多数数据行不含注释，跳过正则匹配
+        if '#' in line:
+            line = _COMMENT_RE.sub('', line)
+        line = line.rstrip()
+        if line:
+            yield line
 
 def clean_data(lines):
     """
@@ -13,24 +117,56 @@ def clean_data(lines):
     Returns:
         list of str: 清理后的行数据列表。
     """
-    # 移除空行
-    lines = [line for line in lines if line != '\n']
+    return list(iter_clean(lines))
 
-    # 移除注释 - 保留质量标签中的注释，例如 # C_3
-    lines = [re.sub(r'(?<!\d\s\s)#(.*)', '' ,line) for line in lines]
+def is_section_header(line):
+    """
+    判断清理后的行是否为节关键词，isalpha 确保节关键词中没有空格、换行符或标点符号。
+    数据行以数字或空白开头，先检查首字符即可排除，只有候选行才完整检查 isalpha。
+    """
+    return line[:1].isalpha() and line.isalpha()
 
-    # 移除换行符
-    lines = [re.sub(r'\n', '', line) for line in lines]
+def read_clean_lines(filename, header_only=False, last_section=None):
+    """
+    流式读取并清理 LAMMPS 数据文件，只保留所需部分，不必将整个文件读入内存。
 
-    # 移除由于注释被移除而导致的空字符串
-    lines = [line for line in lines if line != '']
+    Args:
+        filename (str): 文件路径。
+        header_only (bool): 为 True 时读到第一个节关键词即停止。
+        last_section (str): 读完该节后（遇到下一个节关键词时）停止，默认为 None 读取整个文件。
+
+    Returns:
+        list of str: 清理后的行数据列表。
+    """
+    tidiedLines = []
+    in_last = False
+    # 大缓冲区减少逐行读取时的 read 系统调用次数
+    with open(filename, 'r', buffering=_READ_BUFFER) as f:
+        for line in iter_clean(f):
+            if is_section_header(line):
+                if header_only or in_last:
+                    break
+                in_last = line == last_section
+            tidiedLines.append(line)
+    return tidiedLines
+
+def section_bounds(lines, sectionIndexList):
+    """
+    构建节名称到 (起始索引, 结束索引) 的映射，重复的节名称取第一次出现的位置。
 
-    # 移除尾部空白字符
-    lines = [re.sub(r'\s+$', '', line) for line in lines]
+    Args:
+        lines (list of str): 清理后的行数据列表。
+        sectionIndexList (list of int): find_sections 返回的节索引列表。
 
-    return lines
+    Returns:
+        dict: 节名称到 (起始索引, 下一节起始索引) 的字典。
+    """
+    bounds = {}
+    for start, end in zip(sectionIndexList, sectionIndexList[1:]):
+        bounds.setdefault(lines[start], (start, end))
+    return bounds
 
-def get_data(sectionName, lines, sectionIndexList, useExcept=True):
+def get_data(sectionName, lines, sectionIndexList, useExcept=True, sectionBounds=None):
     """
     获取指定节的数据。
 
@@ -39,21 +175,20 @@ def get_data(sectionName, lines, sectionIndexList, useExcept=True):
         lines (list of str): 清理后的行数据列表。
         sectionIndexList (list of int): 各节的索引列表。
         useExcept (bool): 是否使用异常处理检查节的存在，默认为 True。
+        sectionBounds (dict): section_bounds 预先构建的节范围字典，读取多个节时可复用，默认为 None。
 
     Returns:
         list of list of str: 指定节的数据，以列表形式返回。
     """
-    if useExcept:  # 检查节名称是否存在于 LAMMPS 数据中
-        try:
-            startIndex = lines.index(sectionName)
-        except ValueError:
-            # 如果不存在，返回空列表，可以正常添加到主列表中
-            data = []
-            return data
-    else:  # 允许后续的 try/except 块捕获缺失的节名称
-        startIndex = lines.index(sectionName)
-
-    endIndex = sectionIndexList[sectionIndexList.index(startIndex) + 1]
+    if sectionBounds is None:
+        sectionBounds = section_bounds(lines, sectionIndexList)
+    if sectionName not in sectionBounds:
+        if useExcept:  # 如果不存在，返回空列表，可以正常添加到主列表中
+            return []
+        # 允许后续的 try/except 块捕获缺失的节名称
+        raise ValueError(f'{sectionName} is not in list')
+
+    startIndex, endIndex = sectionBounds[sectionName]
     
     data = lines[startIndex + 1:endIndex]  # +1 表示节名称不被包含
     data = [val.split() for val in data]
@@ -70,8 +205,8 @@ def find_sections(lines):
     Returns:
         list of int: 节的索引列表，包括文件末尾的索引。
     """
-    # 查找节关键词的索引 - isalpha 确保节关键词中没有空格、换行符或标点符号
-    sectionIndexList = [lines.index(line) for line in lines if line.isalpha()]
+    # 查找节关键词的索引
+    sectionIndexList = [i for i, line in enumerate(lines) if is_section_header(line)]
 
     # 将文件末尾的索引添加为最后一个索引
     sectionIndexList.append(len(lines))
@@ -88,11 +223,8 @@ def read_data_atomtype(filename):
     Returns:
         list of str: 原子类型数据。
     """
-    with open(filename, 'r') as f:
-        lines = f.readlines()
-    
-    # 清理输入数据
-    tidiedLines = clean_data(lines)
+    # 流式清理输入数据，只需读到 Masses 节结束
+    tidiedLines = read_clean_lines(filename, last_section='Masses')
     # 构建节索引列表
     sectionIndexList = find_sections(tidiedLines)
     # 获取原子类型数据
@@ -101,26 +233,15 @@ def read_data_atomtype(filename):
 
 def get_map_type_str(filename):
     type_data = read_data_atomtype(filename)
-    # 将质量转换为元素符号，以下为 GAFF2 力场所有元素
-    elements = {
-        12.01: 'C',
-        1.008: 'H',
-        35.45: 'Cl',
-        14.01: 'N',
-        16.00: 'O',
-        19.00: 'F',
-        79.90: 'Br',
-        126.9: 'I',
-        30.97: 'P',
-        32.06: 'S'
-    }
-    # 创建一个空列表来存储元素
-    element_list = []
-
-    for type in type_data:
-        mass = float(type[1])
-        if mass in elements:
-            element_list.append(elements[mass])
+    masses = [float(type[1]) for type in type_data]
+    # 先按取整后的整数质量查表，常见情况下全部命中
+    keys = [int(round(mass * 100)) for mass in masses]
+    if all(key in _ELEM_BY_MASS for key in keys):
+        element_list = [_ELEM_BY_MASS[key] for key in keys]
+    else:
+        # 存在偏差较大的质量时按容差匹配到最接近的参考质量
+        hit = _map_masses(np.array(masses, dtype=np.float64), _REF_MASSES, _MASS_TOL)
+        element_list = _REF_ELEMENTS[hit[hit >= 0]].tolist()
 
     # 将元素列表转换为用空格分隔的字符串
     element_string = ' '.join(element_list)
@@ -139,12 +260,31 @@ def read_sys_info(filename):
         dict: 包含系统信息的字典，键包括 'atom_types', 'bond_types', 'angle_types', 
               'dihedral_types', 'improper_types', 'xlo_xhi', 'ylo_yhi', 'zlo_zhi'。
     """
-    with open(filename, 'r') as f:
-        lines = f.readlines()
-    
-    # 清理输入数据
-    tidiedLines = clean_data(lines)
-    
+    # 流式清理输入数据，只需读取第一节之前的头部
+    return parse_sys_info(read_clean_lines(filename, header_only=True))
+
+def read_sys_info_from_str(content):
+    """
+    从内存中的 LAMMPS 数据内容解析系统信息，与 read_sys_info 相同但无需重新读取文件。
+
+    Args:
+        content (str): LAMMPS 数据文件内容，可以只包含第一节之前的头部。
+
+    Returns:
+        dict: 系统信息字典，见 read_sys_info。
+    """
+    return parse_sys_info(clean_data(content.splitlines()))
+
+def parse_sys_info(tidiedLines):
+    """
+    从清理后的行数据中解析系统信息，只搜索第一节之前的内容。
+
+    Args:
+        tidiedLines (list of str): 清理后的行数据列表。
+
+    Returns:
+        dict: 系统信息字典，见 read_sys_info。
+    """
     # 初始化结果字典
     sys_info = {
         'atom_types': 0,
@@ -166,27 +306,14 @@ def read_sys_info(filename):
     # 只搜索第一节之前的内容
     header_lines = tidiedLines[:first_section_index]
     
-    # 查找类型数量信息
+    # 查找类型数量信息，按行尾关键词一次查表
     for line in header_lines:
-        if 'atom types' in line:
-            sys_info['atom_types'] = int(line.split()[0])
-        elif 'bond types' in line:
-            sys_info['bond_types'] = int(line.split()[0])
-        elif 'angle types' in line:
-            sys_info['angle_types'] = int(line.split()[0])
-        elif 'dihedral types' in line:
-            sys_info['dihedral_types'] = int(line.split()[0])
-        elif 'improper types' in line:
-            sys_info['improper_types'] = int(line.split()[0])
-        elif 'xlo xhi' in line:
-            parts = line.split()
-            sys_info['xlo_xhi'] = (float(parts[0]), float(parts[1]))
-        elif 'ylo yhi' in line:
-            parts = line.split()
-            sys_info['ylo_yhi'] = (float(parts[0]), float(parts[1]))
-        elif 'zlo zhi' in line:
-            parts = line.split()
-            sys_info['zlo_zhi'] = (float(parts[0]), float(parts[1]))
+        parts = line.split()
+        tail = ' '.join(parts[-2:])
+        if tail in _HEADER_COUNTS:
+            sys_info[_HEADER_COUNTS[tail]] = int(parts[0])
+        elif tail in _HEADER_BOX:
+            sys_info[_HEADER_BOX[tail]] = (float(parts[0]), float(parts[1]))
     
     return sys_info
 
@@ -2,17 +2,64 @@
 # 该模块为模拟模块，包括初始化路径、创建写入文件路径、执行模拟等
 
 import os
+import re
+import shutil
 import logging
-import ast
 import time
-from src.filewriter import write_file, combin_files
+from src.filewriter import combin_files
 from pysimm.system import System, read_lammps
 from pysimm.lmps import Simulation
-from src.readdata import read_sys_info
+from src.readdata import read_sys_info_from_str
+from src.codec import decode_reaction_index_dicts
 
 # 设置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# 需要添加 '/gpu' 后缀的关键词（前后均为空格），使用环视以便相邻的关键词共用空格
+_GPU_RE = re.compile(r'(?<= )(lj/cut(?:/coul/long)?|n[vp]t|nve)(?= )')
+
+# 暂时固定使用的产物 SMILES
+_DEFAULT_PRODUCTS = (
+    "[H]c1c(C(=O)Cl)c([H])c(C(=O)N2C([H])([H])C([H])([H])N([H])C([H])([H])C2([H])[H])c([H])c1C(=O)Cl",
+    "[H]c1c(C(Cl)=O)c([H])c(C(N2C([H])([H])C([H])([H])N(Cc3c(c(C(Cl)=O)c(c(c3[H])C(Cl)=O)[H])[H])C([H])([H])C2([H])[H])=O)c([H])c1C(Cl)=O",
+)
+
+def _make_paths(reaction_path, extra_run_dirs=()):
+    """创建反应体系目录及各子目录。
+
+    Args:
+        reaction_path: 反应体系根目录的绝对路径。
+        extra_run_dirs: 需要额外在 run 目录下创建的子目录名。
+
+    Returns:
+        paths: 子目录名到路径（以 '/' 结尾）的字典。
+    """
+    reaction_path = reaction_path.rstrip('/')
+    os.makedirs(reaction_path, exist_ok=True)
+
+    # 创建各个子目录路径，路径均以 '/' 结尾，直接用 f-string 拼接
+    paths = {
+        'lt': f'{reaction_path}/lt/',
+        'mol': f'{reaction_path}/mol/',
+        'sys': f'{reaction_path}/sys/',
+        'map': f'{reaction_path}/map/',
+        'data': f'{reaction_path}/data/',
+        'run': f'{reaction_path}/run/',
+        'logs': f'{reaction_path}/logs/',
+        'result': f'{reaction_path}/run/result/'
+    }
+    for name in extra_run_dirs:
+        paths[name] = f'{reaction_path}/run/{name}/'
+
+    # 创建所有子目录，父目录已存在，按顺序逐级 mkdir 即可
+    for path in paths.values():
+        try:
+            os.mkdir(path)
+        except FileExistsError:
+            pass
+    logging.info(f"创建目录: {reaction_path} 下 {len(paths)} 个子目录")
+    return paths
+
 def simulation_init(db, id, tmp_path):
     """初始化模拟，包括从数据库读取反应物和溶剂的 SMILES，创建文件路径。
 
@@ -28,35 +75,39 @@ def simulation_init(db, id, tmp_path):
     
     # 从数据库中读取反应物和溶剂的 SMILES 和其他信息
     try:
-        reactant1_smiles = db.get_value_by_id(id, 'reactant1_smiles')
-        reactant1_id = db.get_value_by_id(id, 'reactant1_key')
-        r1_num = db.get_value_by_id(id, 'r1_num')
-
-        reactant2_smiles = db.get_value_by_id(id, 'reactant2_smiles')
-        reactant2_id = db.get_value_by_id(id, 'reactant2_key')
-        r2_num = db.get_value_by_id(id, 'r2_num')
-
-        solvent_smiles = db.get_value_by_id(id, 'solvent_smiles')
-        solvent_id = db.get_value_by_id(id, 'solvent_key')
-        sol_num = db.get_value_by_id(id, 'sol_num')
-
-        product_smiles = "[H]c1c(C(=O)Cl)c([H])c(C(=O)N2C([H])([H])C([H])([H])N([H])C([H])([H])C2([H])[H])c([H])c1C(=O)Cl;[H]c1c(C(Cl)=O)c([H])c(C(N2C([H])([H])C([H])([H])N(Cc3c(c(C(Cl)=O)c(c(c3[H])C(Cl)=O)[H])[H])C([H])([H])C2([H])[H])=O)c([H])c1C(Cl)=O"
-        byproduct_smiles = db.get_value_by_id(id, 'byproduct_smiles')
+        # 所需各列一次查询取出
+        row = db.get_values_by_id(id, ['reactant1_smiles', 'reactant1_key', 'r1_num',
+                                       'reactant2_smiles', 'reactant2_key', 'r2_num',
+                                       'solvent_smiles', 'solvent_key', 'sol_num',
+                                       'byproduct_smiles', 'reaction_index_dicts'])
+        reactant1_smiles = row['reactant1_smiles']
+        reactant1_id = row['reactant1_key']
+        r1_num = row['r1_num']
+
+        reactant2_smiles = row['reactant2_smiles']
+        reactant2_id = row['reactant2_key']
+        r2_num = row['r2_num']
+
+        solvent_smiles = row['solvent_smiles']
+        solvent_id = row['solvent_key']
+        sol_num = row['sol_num']
+
+        byproduct_smiles = row['byproduct_smiles']
         
-        reaction_index_dicts_str = db.get_value_by_id(id, 'reaction_index_dicts')
-        reaction_index_dicts_list = ast.literal_eval(reaction_index_dicts_str)
+        reaction_index_dicts_blob = row['reaction_index_dicts']
+        reaction_index_dicts_list = decode_reaction_index_dicts(reaction_index_dicts_blob)
 
     except KeyError as e:
         logging.error(f"未找到 ID {id} 的数据: {e}")
         raise
 
-    product_smiles_list = product_smiles.split(';')
+    product_smiles_list = _DEFAULT_PRODUCTS
 
     # 定义文件名变量
     r1_file_name = f'r1_{reactant1_id}'
     r2_file_name = f'r2_{reactant2_id}'
     sol_file_name = f'sol_{solvent_id}'
-    p_file_name_list = [f'{r1_file_name}_{r2_file_name}_{i}' for i, _ in enumerate(product_smiles_list)]
+    p_file_name_list = tuple(f'{r1_file_name}_{r2_file_name}_{i}' for i in range(len(product_smiles_list)))
     byp_file_name = 'byp'
 
     # 返回字典
@@ -88,27 +139,9 @@ def simulation_init(db, id, tmp_path):
     reaction_path = os.path.join(base_PATH, tmp_path, str(id))
     # 确保路径为绝对路径
     reaction_path = os.path.abspath(reaction_path)
-    os.makedirs(reaction_path, exist_ok=True)
-
-    # 创建各个子目录路径
-    paths = {
-        'lt': os.path.join(reaction_path, 'lt') + '/',
-        'mol': os.path.join(reaction_path, 'mol') + '/',
-        'sys': os.path.join(reaction_path, 'sys') + '/',
-        'map': os.path.join(reaction_path, 'map') + '/',
-        'data': os.path.join(reaction_path, 'data') + '/',
-        'run': os.path.join(reaction_path, 'run') + '/',
-        'logs': os.path.join(reaction_path, 'logs') + '/',
-        'result': os.path.join(reaction_path, 'run') + '/result/'
-    }
-
-    # 创建所有子目录
-    for path in paths.values():
-        os.makedirs(path, exist_ok=True)
-        logging.info(f"创建目录: {path}")
 
     # 将路径信息添加到 path_dict 中
-    path_dict['paths'] = paths
+    path_dict['paths'] = _make_paths(reaction_path)
     return path_dict
 
 def path_init(reactant1_smiles, reactant2_smiles, solvent_smiles, 
@@ -138,27 +171,8 @@ def path_init(reactant1_smiles, reactant2_smiles, solvent_smiles,
     base_PATH = os.path.abspath(base_PATH)
     reaction_path = os.path.join(base_PATH, tmp_path, id)
 
-    os.makedirs(reaction_path, exist_ok=True)
-
-    # 创建各个子目录路径
-    paths = {
-        'lt': os.path.join(reaction_path, 'lt') + '/',
-        'mol': os.path.join(reaction_path, 'mol') + '/',
-        'sys': os.path.join(reaction_path, 'sys') + '/',
-        'map': os.path.join(reaction_path, 'map') + '/',
-        'data': os.path.join(reaction_path, 'data') + '/',
-        'run': os.path.join(reaction_path, 'run') + '/',
-        'logs': os.path.join(reaction_path, 'logs') + '/',
-        'result': os.path.join(reaction_path, 'run') + '/result/',
-        'xlink': os.path.join(reaction_path, 'run') + '/xlink/',
-        'insert': os.path.join(reaction_path, 'run') + '/insert/',
-        'MSD': os.path.join(reaction_path, 'run') + '/MSD/'
-    }
-
-    # 创建所有子目录
-    for path in paths.values():
-        os.makedirs(path, exist_ok=True)
-        logging.info(f"创建目录: {path}")
+    # 创建反应体系目录及各子目录
+    paths = _make_paths(reaction_path, ('xlink', 'insert', 'MSD'))
 
     # 计算各组分的分子数量
     r1_num = reactant1_ratio * num
@@ -203,26 +217,27 @@ def simulation_file_collect(path_dict):
     data_PATH = path_dict['paths']['data']
     map_PATH = path_dict['paths']['map']
     xlink_PATH = path_dict['paths']['xlink']
-    str_list = []
-    str_list.append(f'cp {data_PATH}cleanedsystem.data {xlink_PATH}system.data\n')
-    str_list.append(f'cp {data_PATH}cleanedsystem.in.settings {xlink_PATH}system.in.settings\n')
-    # str_list.append(f'cp {data_PATH}system.in.init {xlink_PATH}system.in.init\n')
+    # (源文件, 目标文件) 列表
+    copy_list = [
+        (f'{data_PATH}cleanedsystem.data', f'{xlink_PATH}system.data'),
+        (f'{data_PATH}cleanedsystem.in.settings', f'{xlink_PATH}system.in.settings'),
+    ]
     for map_name in path_dict['map_templates'].keys():
-        str_list.append(f'cp {map_PATH}mol.pre_{map_name} {xlink_PATH}mol.pre_{map_name}\n')
-        str_list.append(f'cp {map_PATH}mol.post_{map_name} {xlink_PATH}mol.post_{map_name}\n')
-        str_list.append(f'cp {map_PATH}txt.{map_name} {xlink_PATH}txt.{map_name}\n')
-    
-    write_file(xlink_PATH, 'getfile.sh', str_list)
+        for file_name in (f'mol.pre_{map_name}', f'mol.post_{map_name}', f'txt.{map_name}'):
+            copy_list.append((f'{map_PATH}{file_name}', f'{xlink_PATH}{file_name}'))
     
     try:
-        os.system(f'. {xlink_PATH}getfile.sh > /dev/null 2>&1')
+        # 进程内直接复制，无需为每个文件启动 cp 进程
+        for src, dst in copy_list:
+            shutil.copyfile(src, dst)
         # 将 system.data 和 system.in.settings 的内容合并到 sys_init.lmps
-        combin_files(xlink_PATH)
+        header = combin_files(xlink_PATH)
     except Exception as e:
         logging.error(f"校验生成输入文件完整性出错: {e}")
         raise
 
-    sys_info = read_sys_info(xlink_PATH + 'sys_init.lmps')
+    # 直接解析合并时保留的头部，无需重新读取 sys_init.lmps
+    sys_info = read_sys_info_from_str(header)
     path_dict['sys_info'] = sys_info
     logging.info('模拟文件收集完成')
     return path_dict
@@ -253,23 +268,24 @@ class SimulationModule(Simulation):
         
     @staticmethod
     def init_writer():
-        init_str = ''
-        init_str += '#' * 80 + '\n'
-        init_str += "units           real\n"
-        init_str += "pair_style      lj/cut 12.0\n"
-        init_str += "atom_style      full\n"
-        init_str += "bond_style      harmonic\n"
-        init_str += "angle_style     harmonic\n"
-        init_str += "dihedral_style  fourier\n"
-        init_str += "improper_style  cvff\n"
-        init_str += "\n"
-        init_str += "dimension       3\n"
-        init_str += "boundary        p p p\n"
-        init_str += "neigh_modify    every 1 delay 0 check yes\n"
-        init_str += "neighbor        2.5 bin\n"
-        init_str += "read_data       sys_init.lmps\n"
-        init_str += '#' * 80 + '\n'
-        return init_str
+        parts = [
+            '#' * 80 + '\n',
+            "units           real\n",
+            "pair_style      lj/cut 12.0\n",
+            "atom_style      full\n",
+            "bond_style      harmonic\n",
+            "angle_style     harmonic\n",
+            "dihedral_style  fourier\n",
+            "improper_style  cvff\n",
+            "\n",
+            "dimension       3\n",
+            "boundary        p p p\n",
+            "neigh_modify    every 1 delay 0 check yes\n",
+            "neighbor        2.5 bin\n",
+            "read_data       sys_init.lmps\n",
+            '#' * 80 + '\n',
+        ]
+        return ''.join(parts)
 
     def input_conditions(self, simulation_params):
         self.input_conditions_start(simulation_params)
@@ -309,53 +325,47 @@ class SimulationModule(Simulation):
         r2_num = nums['r2']
         sol_num = nums['sol']
         post_type = len(p_names_list)
+        map_path = self.map_PATH
         
-        str_tmp0 = ""
-        str_tmp0 += f"molecule        pre {self.map_PATH}pre_mol.data\n"
-        for i in range(post_type):
-            str_tmp0 += f"molecule        post_{i} {self.map_PATH}post_{i}_mol.data\n"
-        self.add_custom(str_tmp0)
+        parts0 = [f"molecule        pre {map_path}pre_mol.data\n"]
+        parts0.extend(f"molecule        post_{i} {map_path}post_{i}_mol.data\n" for i in range(post_type))
         
-        str_tmp1 = ""
-        str_tmp1 += "timestep        1\n"
-        str_tmp1 += "fix             md_normal  all npt temp 298.15 298.15 100.0 iso 1.0 1.0 1000.0\n"
-        str_tmp1 += "run             2000\n"
-        str_tmp1 += "unfix           md_normal\n"
-        self.add_custom(str_tmp1)
+        parts1 = [
+            "timestep        1\n",
+            "fix             md_normal  all npt temp 298.15 298.15 100.0 iso 1.0 1.0 1000.0\n",
+            "run             2000\n",
+            "unfix           md_normal\n",
+        ]
         
-        str_tmp2 = ""
-        str_tmp2 += "fix             xlink_fix all bond/react stabilization yes statted_grp .03 &\n"
-        for i in range(post_type):
-            # 每 100 步反应一次，反应距离为 [0, react_len]
-            str_tmp2 += f"                    react rxn1 all 100 0 {react_len} pre post_{i} {self.map_PATH}automap_{i}.data stabilize_steps 100\n"
-        str_tmp2 += "fix             nvt_md all nvt temp 300.0 300.0 100.0\n"
-        str_tmp2 += "run             100000\n"
-        str_tmp2 += "unfix           nvt_md\n"
-        str_tmp2 += "fix             npt_md  all npt temp 298.15 298.15 100.0 iso 1.0 1.0 1000.0\n"
-        str_tmp2 += "run             100000\n"
-        str_tmp2 += "unfix           npt_md\n"
-        str_tmp2 += "unfix           xlink_fix\n"
-        self.add_custom(str_tmp2)
+        parts2 = ["fix             xlink_fix all bond/react stabilization yes statted_grp .03 &\n"]
+        # 每 100 步反应一次，反应距离为 [0, react_len]
+        parts2.extend(f"                    react rxn1 all 100 0 {react_len} pre post_{i} {map_path}automap_{i}.data stabilize_steps 100\n"
+                      for i in range(post_type))
+        parts2.extend([
+            "fix             nvt_md all nvt temp 300.0 300.0 100.0\n",
+            "run             100000\n",
+            "unfix           nvt_md\n",
+            "fix             npt_md  all npt temp 298.15 298.15 100.0 iso 1.0 1.0 1000.0\n",
+            "run             100000\n",
+            "unfix           npt_md\n",
+            "unfix           xlink_fix\n",
+        ])
+        # 三段合并为一次 add_custom，段间补上 add_custom 原本追加的换行
+        self.add_custom('\n'.join([''.join(parts0), ''.join(parts1), ''.join(parts2)]))
         
         
     def input_conditions_end(self, simulation_params):
-        str_end = ''
-        str_end += "\n\n"
-        str_end += f"write_restart   {self.result_PATH}{simulation_params['restart']['restart_file']}\n"
-        str_end += f"write_data      {self.result_PATH}{simulation_params['restart']['data_file']}\n\n"
-        self.add_custom(str_end)
+        parts = [
+            "\n\n",
+            f"write_restart   {self.result_PATH}{simulation_params['restart']['restart_file']}\n",
+            f"write_data      {self.result_PATH}{simulation_params['restart']['data_file']}\n\n",
+        ]
+        self.add_custom(''.join(parts))
 
     @staticmethod
     def add_gpu(input_str):
-        # 定义需要查找的关键词
-        keywords = [' lj/cut ', ' lj/cut/coul/long ', ' nvt ', ' npt ', ' nve ']
-
-        # 遍历关键词并替换
-        for keyword in keywords:
-            if keyword in input_str:
-                # 替换关键词，添加后缀 '/gpu'
-                input_str = input_str.replace(keyword, f"{keyword[:-1]}/gpu ")
-        return input_str
+        # 一次扫描替换所有关键词，添加后缀 '/gpu'
+        return _GPU_RE.sub(r'\1/gpu', input_str)
     
     def get_lammps_in(self, simulation_params, gpu = False):
         
@@ -1,9 +1,10 @@
 # template.py
 # 为lammps生成模板文件
 
+import functools
 import logging
 import jinja2
-import os
+import shutil
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 def generate_xlink_lammps_params(path_dict):
@@ -20,29 +21,28 @@ def generate_xlink_lammps_params(path_dict):
 
     
     # 根据map_templates动态生成分子模板和反应参数
-    molecule_templates = {}
-    reactions_list = []
-    
-    # 遍历map_templates生成分子模板和反应参数
-    for i, map_key in enumerate(path_dict['map_templates'].keys(), 1):
-        # 添加分子模板
-        pre_mol_name = f'pre{i}'
-        post_mol_name = f'post{i}'
-        
-        molecule_templates[pre_mol_name] = xlink_PATH + f'mol.pre_{map_key}'
-        molecule_templates[post_mol_name] = xlink_PATH + f'mol.post_{map_key}'
-        
-        # 添加反应参数
-        reactions_list.append({
+    items = list(enumerate(path_dict['map_templates'].keys(), 1))
+    # 分子模板按 pre1, post1, pre2, post2... 的顺序排列
+    molecule_templates = {
+        name: path
+        for i, map_key in items
+        for name, path in ((f'pre{i}', xlink_PATH + f'mol.pre_{map_key}'),
+                           (f'post{i}', xlink_PATH + f'mol.post_{map_key}'))
+    }
+    # 反应参数
+    reactions_list = [
+        {
             'name': f'rxn{i}',
             'nevery': 100,
             'mincutoff': 0.0,
             'maxcutoff': 5.0,
-            'pre_mol': pre_mol_name,
-            'post_mol': post_mol_name,
+            'pre_mol': f'pre{i}',
+            'post_mol': f'post{i}',
             'map_file': xlink_PATH + f'txt.{map_key}',
             'stabilize_steps': 60
-        })
+        }
+        for i, map_key in items
+    ]
     
     # 获取元素列表
     elements = path_dict['elem_type_str']
@@ -52,13 +52,13 @@ def generate_xlink_lammps_params(path_dict):
     r1_count = 0
     r2_count = 0
     
-    # 从path_dict中获取反应物数量
-    if 'num' in path_dict:
-        for mol_name, count in path_dict['num'].items():
-            if mol_name.startswith('r1'):
-                r1_count += count
-            elif mol_name.startswith('r2'):
-                r2_count += count
+    # 从path_dict中获取反应物数量，单次遍历同时统计，按前两个字符切片比较
+    for mol_name, count in path_dict.get('num', {}).items():
+        prefix = mol_name[:2]
+        if prefix == 'r1':
+            r1_count += count
+        elif prefix == 'r2':
+            r2_count += count
     
     if r1_count > 0:
         molecule_numbers['N_single'] = [1, r1_count]
@@ -242,6 +242,21 @@ def add_all_lammps_params(path_dict):
     
     return path_dict
 
+@functools.lru_cache(maxsize=8)
+def _template_env(tplt_PATH):
+    """
+    按模板目录缓存 Jinja2 环境，环境内部缓存已编译的模板，批量生成时每个模板只解析一次
+
+    Args:
+        tplt_PATH (str): 模板目录路径
+
+    Returns:
+        jinja2.Environment: Jinja2 环境
+    """
+    # 模板文件运行期间不会修改，关闭自动重载检查
+    return jinja2.Environment(loader=jinja2.FileSystemLoader(tplt_PATH), trim_blocks=True, lstrip_blocks=True,
+                              auto_reload=False)
+
 def write_lammps_template(path_dict):
     """
     根据path_dict中的参数生成LAMMPS模板文件
@@ -257,8 +272,8 @@ def write_lammps_template(path_dict):
     tplt_PATH = path_dict['paths']['template']
     insert_PATH = path_dict['paths']['insert']
 
-    # 创建Jinja2环境
-    env = jinja2.Environment(loader=jinja2.FileSystemLoader(tplt_PATH), trim_blocks=True, lstrip_blocks=True)
+    # 获取Jinja2环境
+    env = _template_env(tplt_PATH)
     
     # 加载并渲染xlink模板
     template_xlink = env.get_template('in.xlink.template.lammps')
@@ -285,7 +300,7 @@ def write_lammps_template(path_dict):
     logging.info(f"已生成分子模板文件: {so4_params['so4_file_name']}")
 
     # 复制Na分子文件
-    os.system(f'cp {tplt_PATH}Na.txt {insert_PATH}')
+    shutil.copy(f'{tplt_PATH}Na.txt', insert_PATH)
 
     # 加载并渲染insertH2O模板
     template_insert = env.get_template('in.insertH2O.template.lammps')